@@ -0,0 +1,46 @@
+"""
+Measures the forecasting throughput of the LSTM model, in predictions per
+second, for batches of symbols forecast together, in eager mode and
+exported to TorchScript. Run from the cryptocurrencies_price_forecasting
+folder with:
+
+    python -m benchmarks.forecast_throughput
+"""
+
+import os
+import tempfile
+import torch
+from time import perf_counter
+from src.model import LSTM, export_torchscript, set_num_threads
+
+BATCH_SIZES = [1, 16, 256]
+INPUT_WINDOW = 365
+HORIZON = 30
+N_REPEATS = 3
+
+
+def throughput(forecast, x: torch.Tensor) -> float:
+    forecast(x, HORIZON)  # Warm-up
+    start = perf_counter()
+    for _ in range(N_REPEATS):
+        forecast(x, HORIZON)
+    elapsed = perf_counter() - start
+    return N_REPEATS * x.size(0) * HORIZON / elapsed
+
+
+def main():
+    set_num_threads(os.cpu_count())
+    model = LSTM(input_size=1, hidden_size=50, num_layers=1).eval()
+    with tempfile.TemporaryDirectory() as folder:
+        scripted_model = export_torchscript(model, os.path.join(folder, "lstm.pt"))
+
+    print(f"{'symbols':>8} {'eager':>14} {'torchscript':>14}  [predictions/s]")
+    for batch_size in BATCH_SIZES:
+        x = torch.rand(batch_size, INPUT_WINDOW, 1)
+        eager = throughput(model.forecast, x)
+        scripted = throughput(scripted_model.forecast, x)
+        print(f"{batch_size:>8} {eager:>14.1f} {scripted:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
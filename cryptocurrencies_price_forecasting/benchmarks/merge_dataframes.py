@@ -0,0 +1,60 @@
+"""
+Compares the pairwise outer merge of per-symbol price DataFrames with the
+single-pass merge of crypto_api, for 10 and 500 symbols with 14 years of
+daily prices. Run from the cryptocurrencies_price_forecasting folder with:
+
+    python -m benchmarks.merge_dataframes
+"""
+
+import numpy as np
+import pandas as pd
+from time import perf_counter
+from src.crypto_api import _create_dataframe, _right_indexmerge_dataframes, DAY_MS
+
+N_SYMBOLS = [10, 500]
+N_DAYS = 365 * 14
+
+
+def random_dataframes(n_symbols: int, seed: int = 0):
+    # Coins listed at random days, with daily prices up to the same last day
+    rng = np.random.default_rng(seed)
+    last_day = 1_700_000_000_000 // DAY_MS
+    dataframes = []
+    for i in range(n_symbols):
+        first_day = last_day - rng.integers(30, N_DAYS)
+        timestamps = np.arange(first_day, last_day + 1) * DAY_MS
+        prices = rng.lognormal(size=len(timestamps))
+        dataframes.append(
+            _create_dataframe(np.column_stack([timestamps, prices]), f"coin{i}")
+        )
+    return dataframes
+
+
+def pairwise_merge(dataframes):
+    df_merged = dataframes[0]
+    for df in dataframes[1:]:
+        df_merged = pd.merge(
+            df_merged, df, left_index=True, right_index=True, how="outer"
+        )
+    return df_merged
+
+
+def main():
+    print(f"{'symbols':>8} {'merge':>10} {'seconds':>10} {'MiB':>8}")
+    for n_symbols in N_SYMBOLS:
+        dataframes = random_dataframes(n_symbols)
+        merges = [
+            ("pairwise", pairwise_merge),
+            ("concat", _right_indexmerge_dataframes),
+            ("float32", lambda dfs: _right_indexmerge_dataframes(dfs, np.float32)),
+        ]
+        for name, merge in merges:
+            start = perf_counter()
+            df = merge(dataframes)
+            elapsed = perf_counter() - start
+            size = df.memory_usage(deep=True).sum() / 2**20
+            print(f"{n_symbols:>8} {name:>10} {elapsed:>10.4f} {size:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
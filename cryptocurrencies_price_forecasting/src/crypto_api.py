@@ -1,9 +1,118 @@
+import os
+import json
 import requests
+import numpy as np
 import pandas as pd
-from time import sleep
+from math import ceil
+from time import sleep, monotonic, time
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
+BASE_URL = "https://api.coingecko.com/api/v3/"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+DAY_MS = 24 * 60 * 60 * 1000
+INTERVAL_MS = {"daily": DAY_MS, "hourly": DAY_MS // 24}
 
-def _get_crypto_prices(symbol, interval, range_period):
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter. Tokens are refilled at a constant
+    rate up to the bucket capacity, and every request takes one token.
+
+    Parameters:
+    - rate (float): The number of tokens added per second.
+    - capacity (int): The maximum number of tokens, i.e., the largest burst of
+      requests that can be sent at once.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_refill = monotonic()
+        self._lock = Lock()
+
+    def acquire(self):
+        """
+        Takes one token, blocking until one is available.
+        """
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._last_refill) * self.rate
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self.rate
+            sleep(wait_time)
+
+
+def create_session(pool_size=10):
+    """
+    Creates a requests Session whose connection pool can be shared by
+    pool_size concurrent threads.
+
+    Parameters:
+    - pool_size (int): The maximum number of pooled connections per host.
+
+    Returns:
+    - requests.Session: The session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _request_json(
+    url, params=None, session=None, rate_limiter=None, max_retries=5, backoff=1.0
+):
+    """
+    Sends a GET request and decodes its JSON body. Responses with status 429
+    or 5xx are retried with exponential backoff, honoring the Retry-After
+    header when the server sends it.
+
+    Parameters:
+    - url (str): The request URL.
+    - params (dict): The query parameters.
+    - session (requests.Session): The session used to send the request.
+      Defaults to a one-off request.
+    - rate_limiter (TokenBucket): Rate limiter acquired before every attempt.
+    - max_retries (int): The maximum number of retries.
+    - backoff (float): The wait in seconds before the first retry, doubled on
+      every retry.
+
+    Returns:
+    - tuple: The decoded JSON body and the response.
+    """
+    get = requests.get if session is None else session.get
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        response = get(url, params=params)
+        if response.status_code not in RETRY_STATUS_CODES or attempt == max_retries:
+            break
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is not None and retry_after.isdigit():
+            sleep(int(retry_after))
+        else:
+            sleep(backoff * 2**attempt)
+    return response.json(), response
+
+
+def _get_crypto_prices(
+    symbol,
+    interval,
+    range_period,
+    session=None,
+    rate_limiter=None,
+    base_url=BASE_URL,
+):
     """
     Fetches historical market prices for a specified cryptocurrency.
 
@@ -11,21 +120,190 @@ def _get_crypto_prices(symbol, interval, range_period):
     - symbol (str): The symbol or ID of the cryptocurrency (e.g., 'bitcoin').
     - interval (str): The time interval for the data (e.g., 'daily').
     - range_period (int): The number of days for the specified time interval.
+    - session (requests.Session): The session used to send the request.
+    - rate_limiter (TokenBucket): Rate limiter shared by concurrent requests.
+    - base_url (str): The API base URL, e.g., of a local stand-in server.
 
     Returns:
     - list: A list of historical prices for the cryptocurrency.
     """
-    base_url = "https://api.coingecko.com/api/v3/coins/"
-    endpoint = f"{symbol}/market_chart"
+    endpoint = f"coins/{symbol}/market_chart"
     params = {"vs_currency": "usd", "interval": interval, "days": range_period}
-    response = requests.get(base_url + endpoint, params=params)
-    data = response.json()
+    data, response = _request_json(
+        base_url + endpoint, params, session=session, rate_limiter=rate_limiter
+    )
     try:
         return data["prices"]
     except KeyError:
         raise Exception(f"Could not extract {symbol} prices: {response.content}")
 
 
+def fetch_crypto_prices(
+    symbols,
+    interval,
+    range_period,
+    max_workers=8,
+    requests_per_minute=30,
+    session=None,
+    base_url=BASE_URL,
+):
+    """
+    Fetches historical market prices for many cryptocurrencies concurrently.
+    All requests share one pooled session and one token bucket rate limiter,
+    so the API rate limit is respected while waiting for several responses
+    at once.
+
+    Parameters:
+    - symbols (list): List of cryptocurrency symbols or IDs.
+    - interval (str): The time interval for the data (e.g., 'daily').
+    - range_period (int or dict): The number of days for the specified time
+      interval, or a dictionary with the number of days of each symbol.
+    - max_workers (int): The maximum number of concurrent requests.
+    - requests_per_minute (float): The sustained request rate allowed by the
+      API.
+    - session (requests.Session): The session used to send the requests.
+      Defaults to a new session with max_workers pooled connections, which
+      is closed once all prices are fetched.
+    - base_url (str): The API base URL, e.g., of a local stand-in server.
+
+    Returns:
+    - dict: The list of historical prices of each symbol.
+    """
+    if session is None:
+        with create_session(max_workers) as session:
+            return fetch_crypto_prices(
+                symbols,
+                interval,
+                range_period,
+                max_workers,
+                requests_per_minute,
+                session,
+                base_url,
+            )
+    rate_limiter = TokenBucket(requests_per_minute / 60, capacity=max_workers)
+    with ThreadPoolExecutor(max_workers) as executor:
+        prices = executor.map(
+            lambda symbol: _get_crypto_prices(
+                symbol,
+                interval,
+                (
+                    range_period[symbol]
+                    if isinstance(range_period, dict)
+                    else range_period
+                ),
+                session,
+                rate_limiter,
+                base_url,
+            ),
+            symbols,
+        )
+        return dict(zip(symbols, prices))
+
+
+def _cache_path(cache_dir, symbol, interval):
+    return os.path.join(cache_dir, interval, f"{symbol}.npy")
+
+
+def _read_cache_index(cache_dir, interval):
+    """
+    Reads the cache index of an interval, which maps every cached symbol to
+    the earliest timestamp (in ms) its cache covers. Younger coins have no
+    prices that far back, so the index tells them apart from caches created
+    with a shorter range_period.
+
+    Parameters:
+    - cache_dir (str): The cache folder.
+    - interval (str): The time interval for the data (e.g., 'daily').
+
+    Returns:
+    - dict: The earliest covered timestamp of each symbol.
+    """
+    index_path = os.path.join(cache_dir, interval, "index.json")
+    if not os.path.exists(index_path):
+        return {}
+    with open(index_path) as file:
+        return json.load(file)
+
+
+def load_cached_prices(symbol, interval, cache_dir):
+    """
+    Loads the cached prices of a cryptocurrency. The file is memory-mapped,
+    so prices are only read from disk when accessed.
+
+    Parameters:
+    - symbol (str): The symbol or ID of the cryptocurrency.
+    - interval (str): The time interval for the data (e.g., 'daily').
+    - cache_dir (str): The cache folder.
+
+    Returns:
+    - np.ndarray: A (n, 2) array of (timestamp in ms, price) rows, or None if
+      the symbol is not cached.
+    """
+    path = _cache_path(cache_dir, symbol, interval)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode="r")
+
+
+def update_price_cache(symbols, interval, range_period, cache_dir, **fetch_kwargs):
+    """
+    Updates the cached prices of the given cryptocurrencies. Symbols whose
+    cache covers range_period only fetch the days after their last cached
+    timestamp, which replace the overlapping cached prices (e.g., the
+    intraday price of the last day). Other symbols fetch the whole range.
+    Symbols whose last cached timestamp is less than one interval old have
+    no new prices yet, so they are not fetched.
+
+    Parameters:
+    - symbols (list): List of cryptocurrency symbols or IDs.
+    - interval (str): The time interval for the data (e.g., 'daily').
+    - range_period (int): The number of days for the specified time interval.
+    - cache_dir (str): The cache folder.
+    - fetch_kwargs: Keyword arguments of fetch_crypto_prices.
+    """
+    os.makedirs(os.path.join(cache_dir, interval), exist_ok=True)
+    index = _read_cache_index(cache_dir, interval)
+    now = time() * 1000
+    start = now - range_period * DAY_MS
+
+    # Unknown intervals are always fetched
+    interval_ms = INTERVAL_MS.get(interval, 0)
+
+    days, cached = {}, {}
+    for symbol in symbols:
+        prices = load_cached_prices(symbol, interval, cache_dir)
+        if (
+            prices is None
+            or len(prices) == 0
+            or index.get(symbol, now) > start + DAY_MS
+        ):
+            days[symbol] = range_period
+            index[symbol] = start
+        elif now - prices[-1, 0] >= interval_ms:
+            cached[symbol] = prices
+            days[symbol] = min(range_period, ceil((now - prices[-1, 0]) / DAY_MS) + 1)
+    if len(days) == 0:
+        return
+
+    fetched = fetch_crypto_prices(list(days), interval, days, **fetch_kwargs)
+    for symbol in days:
+        prices = np.array(fetched[symbol], dtype=np.float64).reshape(-1, 2)
+        if symbol in cached:
+            old_prices = cached[symbol]
+            if len(prices) > 0:
+                old_prices = old_prices[old_prices[:, 0] < prices[0, 0]]
+            prices = np.concatenate([old_prices, prices])
+        # Written to a temporary file first, so readers never see a partial
+        # file
+        path = _cache_path(cache_dir, symbol, interval)
+        with open(path + ".tmp", "wb") as file:
+            np.save(file, prices)
+        os.replace(path + ".tmp", path)
+
+    with open(os.path.join(cache_dir, interval, "index.json"), "w") as file:
+        json.dump(index, file)
+
+
 def _create_dataframe(prices, symbol):
     """
     Creates a Pandas DataFrame from a list of cryptocurrency prices.
@@ -44,53 +322,103 @@ def _create_dataframe(prices, symbol):
     return df
 
 
-def _right_indexmerge_dataframes(dataframes):
+def _right_indexmerge_dataframes(dataframes, dtype=None):
     """
-    Merges multiple DataFrames based on their indices.
+    Merges multiple DataFrames based on their indices, aligning all of them
+    on the union of their indices at once.
 
     Parameters:
     - dataframes (list): List of DataFrames to be merged.
+    - dtype (type): The type of the merged columns (e.g., np.float32).
+      Defaults to the type of each DataFrame.
 
     Returns:
     - pd.DataFrame: Merged DataFrame.
     """
-    df_merged = dataframes[0]
-    for df in dataframes[1:]:
-        df_merged = pd.merge(
-            df_merged, df, left_index=True, right_index=True, how="outer"
-        )
+    aligned_dfs = []
+    for df in dataframes:
+        # Repeated timestamps cannot be aligned, the last price is kept
+        if df.index.has_duplicates:
+            df = df[~df.index.duplicated(keep="last")]
+        if dtype is not None:
+            df = df.astype(dtype)
+        aligned_dfs.append(df)
+    df_merged = pd.concat(aligned_dfs, axis=1, join="outer", sort=True)
 
     return df_merged
 
 
-def create_prices_dataframe(symbols, interval, range_period, sleep_time=3):
+def create_prices_dataframe(
+    symbols,
+    interval,
+    range_period,
+    max_workers=8,
+    requests_per_minute=30,
+    base_url=BASE_URL,
+    cache_dir=None,
+    refresh=True,
+    dtype=None,
+    sleep_time=None,
+):
     """
-    Fetches and combines cryptocurrency prices for specified symbols.
+    Fetches and combines cryptocurrency prices for specified symbols. If a
+    cache folder is given, prices are read from the cache, which is first
+    updated with the prices published since the last update.
 
     Parameters:
     - symbols (list): List of cryptocurrency symbols or IDs (e.g., ["bitcoin", "ethereum"]).
     - interval (str): The time interval for the data (e.g., 'daily').
     - range_period (int): The number of days for the specified time interval.
-    - sleep_time (int): The sleep time in seconds between API requests.
+    - max_workers (int): The maximum number of concurrent requests.
+    - requests_per_minute (float): The sustained request rate allowed by the API.
+    - base_url (str): The API base URL, e.g., of a local stand-in server.
+    - cache_dir (str): The price cache folder. Defaults to no cache.
+    - refresh (bool): Whether to update cached symbols. If False, only the
+      symbols missing from the cache are fetched.
+    - dtype (type): The type of the price columns, e.g., np.float32 for a
+      compact DataFrame. Defaults to float64.
+    - sleep_time (float): Deprecated. The sleep time in seconds between API
+      requests. When positive, it sets requests_per_minute to
+      60 / sleep_time.
 
     Returns:
     - pd.DataFrame: Combined DataFrame with prices for all specified cryptocurrencies.
     """
-    crypto_dfs = []
-    for symbol in symbols:
-        prices = _get_crypto_prices(symbol, interval, range_period)
-        df = _create_dataframe(prices, symbol)
-        crypto_dfs.append(df)
-        sleep(sleep_time)
+    if sleep_time is not None and sleep_time > 0:
+        requests_per_minute = 60 / sleep_time
+    fetch_kwargs = {
+        "max_workers": max_workers,
+        "requests_per_minute": requests_per_minute,
+        "base_url": base_url,
+    }
+    if cache_dir is None:
+        prices = fetch_crypto_prices(symbols, interval, range_period, **fetch_kwargs)
+    else:
+        if refresh:
+            missing = symbols
+        else:
+            missing = [
+                symbol
+                for symbol in symbols
+                if load_cached_prices(symbol, interval, cache_dir) is None
+            ]
+        if len(missing) > 0:
+            update_price_cache(
+                missing, interval, range_period, cache_dir, **fetch_kwargs
+            )
+        start = time() * 1000 - range_period * DAY_MS
+        prices = {}
+        for symbol in symbols:
+            cached_prices = load_cached_prices(symbol, interval, cache_dir)
+            prices[symbol] = cached_prices[cached_prices[:, 0] >= start]
+    crypto_dfs = [_create_dataframe(prices[symbol], symbol) for symbol in symbols]
 
-    all_crypto_df = _right_indexmerge_dataframes(crypto_dfs)
+    all_crypto_df = _right_indexmerge_dataframes(crypto_dfs, dtype)
     return all_crypto_df
 
 
-def get_supported_coins():
-    base_url = "https://api.coingecko.com/api/v3/coins/list"
-    response = requests.get(base_url)
-    data = response.json()
+def get_supported_coins(base_url=BASE_URL):
+    data, _ = _request_json(base_url + "coins/list")
 
     coin_names = [coin["name"] for coin in data]
     return coin_names
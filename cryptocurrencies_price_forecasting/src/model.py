@@ -0,0 +1,304 @@
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def sliding_windows(prices, input_window):
+    """
+    Builds the input vectors and labels of a price series without copying
+    it. Row i of the inputs holds the prices p(i-w), ..., p(i-1), oldest
+    first, and the label i is the price p(i).
+
+    Parameters:
+    - prices (np.ndarray): The price series.
+    - input_window (int): The input window length w.
+
+    Returns:
+    - tuple: The (n - w, w) read-only view of input vectors and the (n - w,)
+      view of labels. Both are empty if there are at most w prices.
+    """
+    if len(prices) <= input_window:
+        # Too few prices for a single sample, e.g., of a recently listed coin
+        return np.empty((0, input_window), dtype=prices.dtype), prices[:0]
+    X = sliding_window_view(prices[:-1], input_window)
+    y = prices[input_window:]
+    return X, y
+
+
+class WindowDataset:
+    """
+    Lazy dataset of the input vectors and labels of a price series. Windows
+    are views of the price array, and only the samples requested are copied,
+    so the (n x w) matrix of input vectors is never built. It can be used
+    with torch.utils.data.DataLoader as a map-style dataset.
+
+    Parameters:
+    - prices (np.ndarray): The price series.
+    - input_window (int): The input window length w.
+    - start (int): The first sample of the dataset.
+    - stop (int): The end of the dataset samples. Defaults to all samples.
+    """
+
+    def __init__(self, prices, input_window, start=0, stop=None):
+        self.prices = prices
+        self.input_window = input_window
+        self.X, self.y = sliding_windows(prices, input_window)
+        self.start, self.stop, _ = slice(start, stop).indices(len(self.y))
+
+    def __len__(self):
+        return max(self.stop - self.start, 0)
+
+    def __getitem__(self, i):
+        """
+        Gets a sample.
+
+        Parameters:
+        - i (int): The sample index.
+
+        Returns:
+        - tuple: The (w, 1) input vector and the (1,) label.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Sample {i} out of range")
+        i += self.start
+        return self.X[i, :, np.newaxis].copy(), self.y[i : i + 1].copy()
+
+    def batch(self, indices):
+        """
+        Gets many samples with a single gather.
+
+        Parameters:
+        - indices (np.ndarray): The sample indices.
+
+        Returns:
+        - tuple: The (batch, w, 1) input vectors and the (batch, 1) labels.
+        """
+        indices = np.asarray(indices) + self.start
+        return self.X[indices, :, np.newaxis], self.y[indices, np.newaxis]
+
+    def split(self, train_fraction):
+        """
+        Splits the dataset into consecutive train and test datasets.
+
+        Parameters:
+        - train_fraction (float): The fraction of samples of the train dataset.
+
+        Returns:
+        - tuple: The train and test datasets, sharing the price array.
+        """
+        split_index = self.start + int(len(self) * train_fraction)
+        train = WindowDataset(self.prices, self.input_window, self.start, split_index)
+        test = WindowDataset(self.prices, self.input_window, split_index, self.stop)
+        return train, test
+
+
+def build_window_datasets(
+    df, symbols, input_windows, train_fraction=0.95, dtype=np.float32
+):
+    """
+    Builds the train and test datasets of many cryptocurrencies and input
+    window lengths. The prices of every symbol are converted once, and all
+    of its datasets are views of them.
+
+    Parameters:
+    - df (pd.DataFrame): DataFrame with a "{symbol}_price" column per symbol.
+    - symbols (list): List of cryptocurrency symbols or IDs.
+    - input_windows (list): List of input window lengths.
+    - train_fraction (float): The fraction of samples of each train dataset.
+    - dtype (type): The type of the prices.
+
+    Returns:
+    - dict: The (train, test) datasets of each (symbol, input_window) pair.
+    """
+    datasets = {}
+    for symbol in symbols:
+        # Coins listed after the first date of df start with missing prices
+        prices = np.ascontiguousarray(
+            df[f"{symbol}_price"].dropna().to_numpy(), dtype=dtype
+        )
+        for input_window in input_windows:
+            dataset = WindowDataset(prices, input_window)
+            datasets[symbol, input_window] = dataset.split(train_fraction)
+    return datasets
+
+
+def set_num_threads(num_threads=None, num_interop_threads=None):
+    """
+    Sets the number of CPU threads used by torch. On CPU-only hosts, one
+    thread per physical core usually gives the best throughput.
+
+    Parameters:
+    - num_threads (int): The number of threads used within an operation.
+      Defaults to the current setting.
+    - num_interop_threads (int): The number of threads running independent
+      operations. It can only be set once, before any parallel work starts.
+    """
+    if num_threads is not None:
+        torch.set_num_threads(num_threads)
+    if num_interop_threads is not None:
+        torch.set_num_interop_threads(num_interop_threads)
+
+
+class LSTM(nn.Module):
+    """
+    LSTM price forecaster. The zero initial hidden and cell states are
+    allocated once, for up to max_batch_size samples, instead of on every
+    forward pass.
+
+    Parameters:
+    - input_size (int): The number of expected features in the input.
+    - hidden_size (int): The number of features in the hidden state.
+    - num_layers (int): The number of recurrent layers.
+    - max_batch_size (int): The largest batch served by the preallocated
+      states. Larger batches allocate their own states.
+    """
+
+    def __init__(self, input_size=1, hidden_size=50, num_layers=1, max_batch_size=1024):
+        super().__init__()
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.lstm = nn.LSTM(input_size, hidden_size, num_layers, batch_first=True)
+        self.fc = nn.Linear(hidden_size, 1)
+        self.register_buffer(
+            "h0", torch.zeros(num_layers, max_batch_size, hidden_size), persistent=False
+        )
+        self.register_buffer(
+            "c0", torch.zeros(num_layers, max_batch_size, hidden_size), persistent=False
+        )
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        batch_size = x.size(0)
+        if batch_size <= self.h0.size(1):
+            h0 = self.h0[:, :batch_size]
+            c0 = self.c0[:, :batch_size]
+        else:
+            # Follow the dtype and device of the input, like the buffers
+            h0 = x.new_zeros(self.num_layers, batch_size, self.hidden_size)
+            c0 = x.new_zeros(self.num_layers, batch_size, self.hidden_size)
+
+        out, _ = self.lstm(x, (h0, c0))
+        out = self.fc(out[:, -1, :])
+        return out
+
+    @torch.jit.export
+    def forecast(self, x: torch.Tensor, horizon: int) -> torch.Tensor:
+        """
+        Forecasts the next horizon prices of many series at once. Every
+        prediction is appended to the input window of the next step, whose
+        oldest price is dropped. The windows slide over a single buffer, so
+        no window is copied.
+
+        Parameters:
+        - x (torch.Tensor): The (batch, w, 1) input windows, e.g., one per
+          symbol.
+        - horizon (int): The number of predicted steps.
+
+        Returns:
+        - torch.Tensor: The (batch, horizon) predictions.
+        """
+        batch_size, input_window = x.size(0), x.size(1)
+        prices = x.new_empty(batch_size, input_window + horizon, 1)
+        with torch.no_grad():
+            prices[:, :input_window] = x
+            for t in range(horizon):
+                prices[:, input_window + t] = self.forward(
+                    prices[:, t : t + input_window]
+                )
+        return prices[:, input_window:, 0]
+
+
+def _epoch_batches(dataset, batch_size, shuffle, rng):
+    indices = rng.permutation(len(dataset)) if shuffle else np.arange(len(dataset))
+    for start in range(0, len(dataset), batch_size):
+        X, y = dataset.batch(indices[start : start + batch_size])
+        yield torch.from_numpy(X).float(), torch.from_numpy(y).float()
+
+
+def train_model(
+    model,
+    train_dataset,
+    test_dataset,
+    num_epochs=100,
+    batch_size=16,
+    learning_rate=0.001,
+    num_threads=None,
+    random_state=42,
+    verbose=False,
+):
+    """
+    Trains an LSTM model with the Adam optimizer and the MSE loss,
+    validating it after every epoch. Batches are gathered straight from the
+    window views of the datasets.
+
+    Parameters:
+    - model (LSTM): The model to train.
+    - train_dataset (WindowDataset): The train dataset.
+    - test_dataset (WindowDataset): The validation dataset.
+    - num_epochs (int): The number of epochs.
+    - batch_size (int): The number of samples per batch.
+    - learning_rate (float): The learning rate of the optimizer.
+    - num_threads (int): The number of CPU threads used by torch.
+    - random_state (int): The seed of the train batch shuffling.
+    - verbose (bool): Whether to print the losses of every epoch.
+
+    Returns:
+    - pd.DataFrame: The train and validation loss of every epoch.
+    """
+    set_num_threads(num_threads)
+    rng = np.random.default_rng(random_state)
+    loss_function = nn.MSELoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+
+    train_loss_list, validation_loss_list = [], []
+    for epoch in range(num_epochs):
+        model.train()
+        cumulative_loss = 0
+        for X, y in _epoch_batches(train_dataset, batch_size, True, rng):
+            loss = loss_function(model(X), y)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            cumulative_loss += loss.item() * len(y)
+        train_loss_list.append(cumulative_loss / len(train_dataset))
+
+        model.eval()
+        cumulative_loss = 0
+        with torch.inference_mode():
+            for X, y in _epoch_batches(test_dataset, 1024, False, rng):
+                cumulative_loss += loss_function(model(X), y).item() * len(y)
+        validation_loss_list.append(cumulative_loss / max(len(test_dataset), 1))
+
+        if verbose:
+            print(
+                f"Epoch {epoch}: training loss {train_loss_list[-1]}, "
+                f"validation loss {validation_loss_list[-1]}"
+            )
+
+    df = pd.DataFrame(
+        {"train_loss": train_loss_list, "validation_loss": validation_loss_list}
+    )
+    df.index.name = "epoch"
+    return df
+
+
+def export_torchscript(model, file_path):
+    """
+    Exports a trained model to TorchScript, frozen and optimized for CPU
+    inference. The exported file can be served without Python model code
+    and keeps the forecast method.
+
+    Parameters:
+    - model (LSTM): The trained model.
+    - file_path (str): The path of the exported file.
+
+    Returns:
+    - torch.jit.ScriptModule: The exported module.
+    """
+    scripted_model = torch.jit.script(model.eval())
+    frozen_model = torch.jit.freeze(scripted_model, preserved_attrs=["forecast"])
+    torch.jit.save(frozen_model, file_path)
+    return frozen_model
@@ -0,0 +1,49 @@
+"""
+Compares the peak memory and time of KMeans.fit with float64 and float32
+compute types on img/flower.jpg scaled up. The whole image is assigned as a
+single chunk, since with the default max_memory budget float32 only gets
+twice as many rows per chunk. Run from the image_quantization folder with:
+
+    python -m benchmarks.compute_dtype
+"""
+
+import numpy as np
+import tracemalloc
+from time import perf_counter
+from src.image import Image, load_image
+from src.model import KMeans
+
+SCALES = [1, 2, 4]
+N_CLUSTERS = 32
+MAX_ITER = 10
+
+
+def scaled_image(image: Image, scale: int) -> Image:
+    # Every pixel becomes a scale x scale block
+    rgb_matrix = np.repeat(np.repeat(image.rgb_matrix, scale, axis=0), scale, axis=1)
+    return Image(rgb_matrix)
+
+
+def main():
+    image = load_image("img/flower.jpg")
+    print(f"{'pixels':>10} {'dtype':>8} {'peak MiB':>10} {'seconds':>10}")
+    for scale in SCALES:
+        X = scaled_image(image, scale).rgb_vector
+        for dtype in [np.float64, np.float32]:
+            kmeans = KMeans(
+                N_CLUSTERS, max_iter=MAX_ITER, chunk_size=len(X), dtype=dtype
+            )
+            tracemalloc.start()
+            start = perf_counter()
+            kmeans.fit(X)
+            elapsed = perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{len(X):>10} {np.dtype(dtype).name:>8} "
+                f"{peak / 2**20:>10.1f} {elapsed:>10.4f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ import matplotlib.image as mpimg
 
 class Image:
     def __init__(self, rgb_matrix: np.ndarray, title: str = None):
+        # Pixels are kept as they are, usually uint8. rgb_vector is a view of
+        # rgb_matrix, so no pixel is copied. KMeans converts the pixels it
+        # reads to its own dtype, one chunk at a time
         self.rgb_matrix = rgb_matrix
         self.rgb_vector = rgb_matrix.reshape(-1, 3)
         self.shape = rgb_matrix.shape
@@ -13,10 +16,36 @@ class Image:
 
 def load_image(image_path: str) -> Image:
     rgb_matrix = mpimg.imread(image_path)
+    if rgb_matrix.dtype != np.uint8:
+        # PNG images are read as floats in [0, 1]
+        rgb_matrix = np.uint8(np.rint(rgb_matrix[..., :3] * 255))
     return Image(rgb_matrix)
 
 
+def iter_pixel_batches(
+    image_paths: list[str],
+    batch_size: int = 2**16,
+    shuffle: bool = False,
+    random_state: int = 42,
+):
+    # Loads one image at a time and yields its pixels in (batch_size, 3)
+    # batches, so image collections never have to fit in memory together.
+    # Shuffled batches are unbiased samples of each image, as mini-batch
+    # training expects, but lose the pixel order
+    rng = np.random.default_rng(random_state)
+    for image_path in image_paths:
+        rgb_vector = load_image(image_path).rgb_vector
+        if shuffle:
+            rgb_vector = rgb_vector[rng.permutation(rgb_vector.shape[0])]
+        for start in range(0, rgb_vector.shape[0], batch_size):
+            yield rgb_vector[start : start + batch_size]
+
+
 def rgb_vector_to_image(rgb_vector: np.ndarray, image_shape: tuple):
+    # Float colors (e.g. cluster centers) are rounded to uint8 pixels, which
+    # are reshaped without copying
+    if rgb_vector.dtype != np.uint8:
+        rgb_vector = np.uint8(np.clip(np.rint(rgb_vector), 0, 255))
     return Image(rgb_vector.reshape(image_shape))
 
 
@@ -30,7 +59,7 @@ def plot_rgb_vector(
     fig = plt.figure(figsize=figsize)
     axes = fig.add_subplot(projection="3d")
     r, g, b = rgb_vector[:, 0], rgb_vector[:, 1], rgb_vector[:, 2]
-    colors = rgb_vector / 255
+    colors = rgb_vector / np.float32(255)
     axes.scatter(r, g, b, c=colors, marker="o", s=s, alpha=alpha)
     axes.set_title(title)
     plt.tight_layout()
@@ -1,5 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from time import perf_counter
 
 
 class KMeans:
@@ -9,42 +12,610 @@ class KMeans:
         tol: float = 1e-2,
         max_iter: int = 100,
         random_state: int = 42,
+        chunk_size: int = None,
+        max_memory: int = 256 * 2**20,
+        n_jobs: int = None,
+        n_init: int = 1,
+        n_processes: int = None,
+        algorithm: str = "lloyd",
+        color_reduction: str = None,
+        histogram_bits: int = 5,
+        init: str = "random",
+        dtype: type = np.float32,
     ):
+        if algorithm not in ("lloyd", "hamerly"):
+            raise ValueError(f"Unknown algorithm: {algorithm}")
+        if color_reduction not in (None, "unique", "histogram"):
+            raise ValueError(f"Unknown color reduction: {color_reduction}")
+        if isinstance(init, str) and init not in ("random", "k-means++", "k-means||"):
+            raise ValueError(f"Unknown init: {init}")
         self.k = n_clusters
         self.max_iter = max_iter
         self.tol = tol
+        self.random_state = random_state
         self.rng = np.random.default_rng(random_state)
+        # Rows per label assignment chunk. If not given, it is derived from
+        # max_memory (in bytes) so that peak memory does not depend on the
+        # number of pixels
+        self.chunk_size = chunk_size
+        self.max_memory = max_memory
+        # Threads sharing the row chunks of each iteration
+        self.n_jobs = n_jobs
+        # Independent restarts, run in n_processes parallel processes
+        self.n_init = n_init
+        self.n_processes = n_processes
+        # "lloyd" computes every pixel-center distance on every iteration,
+        # "hamerly" keeps per-pixel distance bounds and skips the distances
+        # they prove unnecessary
+        self.algorithm = algorithm
+        # Pixels can be collapsed before clustering into their "unique"
+        # colors or into a "histogram" with histogram_bits bits per channel.
+        # The reduced colors are clustered weighted by their pixel counts
+        self.color_reduction = color_reduction
+        self.histogram_bits = histogram_bits
+        # Initial centers: "random" pixels, "k-means++" seeding, its
+        # chunked, few-round variant "k-means||" or a (k, 3) array of centers
+        self.init = init
+        # Floating point type of the pixel chunks and distances. Centers,
+        # sums and costs are always accumulated in float64
+        self.dtype = np.dtype(dtype)
 
-    def _initialize_centers(self, X: np.ndarray):
-        centers = self.rng.choice(X, size=self.k, replace=False)
+    def _initialize_centers(self, X: np.ndarray, weights: np.ndarray):
+        if not isinstance(self.init, str):
+            centers = self.init
+        elif self.init == "k-means++":
+            centers = self._kmeans_plusplus(
+                np.asarray(X, dtype=self.dtype), weights, self.k
+            )
+        elif self.init == "k-means||":
+            centers = self._kmeans_parallel(X, weights)
+        else:
+            centers = self.rng.choice(X, size=self.k, replace=False)
         self.cluster_centers_ = np.float64(centers)
 
-    def _update_labels(self, X: np.ndarray):
-        distances = np.linalg.norm(X[:, np.newaxis, :] - self.cluster_centers_, axis=2)
-        self.labels_ = np.argmin(distances, axis=1)
+    def _kmeans_plusplus(self, X: np.ndarray, weights: np.ndarray, k: int):
+        # Every new center is drawn with probability proportional to the
+        # (weighted) squared distance to the closest center drawn so far
+        weights = np.ones(X.shape[0]) if weights is None else weights
+        cumulative = np.cumsum(weights, dtype=np.float64)
+        index = np.searchsorted(cumulative, self.rng.random() * cumulative[-1])
+        centers = [X[index]]
+        closest = np.einsum("ij,ij->i", X - X[index], X - X[index])
+        for _ in range(1, k):
+            cumulative = np.cumsum(closest * weights, dtype=np.float64)
+            if cumulative[-1] > 0:
+                index = np.searchsorted(cumulative, self.rng.random() * cumulative[-1])
+            else:
+                # Every point is already a center
+                index = self.rng.integers(X.shape[0])
+            centers.append(X[index])
+            np.minimum(
+                closest,
+                np.einsum("ij,ij->i", X - X[index], X - X[index]),
+                out=closest,
+            )
+        return np.array(centers)
 
-    def _update_centers(self, X):
-        for j in range(len(self.cluster_centers_)):
-            cluster = X[np.where(self.labels_ == j)]
-            if len(cluster) == 0:
-                return
-            self.cluster_centers_[j] = np.mean(cluster, axis=0)
+    def _kmeans_parallel(
+        self, X: np.ndarray, weights: np.ndarray, n_rounds: int = 5
+    ) -> np.ndarray:
+        # k-means||: a few rounds that sample around 2k candidates each, with
+        # probability proportional to the squared distance to the closest
+        # candidate, followed by k-means++ on the candidates weighted by
+        # their nearest points. Only distances to the new candidates of each
+        # round are computed, in chunks
+        point_weights = np.ones(X.shape[0]) if weights is None else weights
+        cumulative = np.cumsum(point_weights)
+        first = np.searchsorted(cumulative, self.rng.random() * cumulative[-1])
+        candidates = np.float64(X[[first]])
+        _, closest = self._nearest_centers(X, candidates)
+        for _ in range(n_rounds):
+            cost = np.dot(closest, point_weights)
+            if cost == 0:
+                break
+            probabilities = 2 * self.k * point_weights * closest / cost
+            new = np.flatnonzero(self.rng.random(X.shape[0]) < probabilities)
+            new_candidates = np.float64(X[new])
+            _, new_closest = self._nearest_centers(X, new_candidates)
+            np.minimum(closest, new_closest, out=closest)
+            candidates = np.concatenate([candidates, new_candidates])
+
+        labels, _ = self._nearest_centers(X, candidates)
+        candidate_weights = np.bincount(
+            labels, weights=weights, minlength=len(candidates)
+        )
+        if len(candidates) < self.k:
+            # Too few candidates, e.g. for images with very few colors
+            extra = self.rng.choice(X, size=self.k - len(candidates), replace=False)
+            candidates = np.concatenate([candidates, np.float64(extra)])
+            candidate_weights = np.concatenate([candidate_weights, np.ones(len(extra))])
+        return self._kmeans_plusplus(candidates, candidate_weights, self.k)
+
+    def _nearest_centers(self, X: np.ndarray, centers: np.ndarray):
+        # Closest center of every point and its squared distance, in chunks
+        # sized for len(centers) distances per point
+        chunk_rows = self.chunk_size or max(
+            1, self.max_memory // (self.dtype.itemsize * (X.shape[1] + len(centers)))
+        )
+        labels = np.empty(X.shape[0], dtype=np.intp)
+        distances = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            labels[rows], distances[rows] = _closest_centers(
+                np.asarray(X[rows], dtype=self.dtype), centers.astype(self.dtype)
+            )
+        return labels, distances
+
+    def _chunk_rows(self, X: np.ndarray) -> int:
+        if self.chunk_size is not None:
+            chunk_rows = self.chunk_size
+        else:
+            # A dtype copy of the chunk plus its distances to every center
+            row_bytes = self.dtype.itemsize * (X.shape[1] + self.k)
+            chunk_rows = max(1, self.max_memory // row_bytes)
+        if self.n_jobs is not None and self.n_jobs > 1:
+            # Give every thread at least one chunk
+            chunk_rows = min(chunk_rows, -(-X.shape[0] // self.n_jobs))
+        return chunk_rows
+
+    def _assign_chunk(self, X: np.ndarray, weights: np.ndarray, start: int, stop: int):
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2, where x.c is a single
+        # matrix product
+        centers = self._centers
+        chunk = np.asarray(X[start:stop], dtype=self.dtype)
+        distances = chunk @ centers.T
+        distances *= -2
+        distances += np.einsum("ij,ij->i", centers, centers)
+        labels = np.argmin(distances, axis=1)
+        self.labels_[start:stop] = labels
+
+        # Per-cluster sums and counts of the chunk, merged by the caller
+        chunk_weights = None if weights is None else weights[start:stop]
+        sums, counts = _cluster_sums(labels, chunk, self.k, chunk_weights)
+        return sums, counts, distances.size
+
+    def _assign_chunk_hamerly(
+        self, X: np.ndarray, weights: np.ndarray, start: int, stop: int
+    ):
+        # Hamerly's algorithm: upper_ bounds the distance of each pixel to its
+        # center and lower_ its distance to any other center. The pixel keeps
+        # its label while the upper bound is below the lower bound or half
+        # the distance from its center to the closest other center
+        centers = self._centers
+        labels = self.labels_[start:stop]
+        upper = self.upper_[start:stop]
+        lower = self.lower_[start:stop]
+        bound = np.maximum(self._half_center_gap[labels], lower)
+        candidates = np.flatnonzero(upper > bound)
+
+        # Tighten the upper bound with the exact distance to the current
+        # center (pixels labelled -1 have not been assigned yet)
+        assigned = candidates[labels[candidates] >= 0]
+        chunk = np.asarray(X[start + assigned], dtype=self.dtype)
+        upper[assigned] = np.linalg.norm(chunk - centers[labels[assigned]], axis=1)
+        n_distances = len(assigned)
+        candidates = candidates[upper[candidates] > bound[candidates]]
+
+        # Only the remaining pixels are compared with every center
+        chunk = np.asarray(X[start + candidates], dtype=self.dtype)
+        distances = chunk @ centers.T
+        distances *= -2
+        distances += np.einsum("ij,ij->i", centers, centers)
+        distances += np.einsum("ij,ij->i", chunk, chunk)[:, np.newaxis]
+        np.sqrt(np.maximum(distances, 0, out=distances), out=distances)
+        n_distances += distances.size
+        closest = np.argmin(distances, axis=1)
+        rows = np.arange(len(candidates))
+        labels[candidates] = closest
+        upper[candidates] = distances[rows, closest]
+        distances[rows, closest] = np.inf
+        lower[candidates] = np.min(distances, axis=1, initial=np.inf)
+
+        chunk = np.asarray(X[start:stop], dtype=self.dtype)
+        chunk_weights = None if weights is None else weights[start:stop]
+        sums, counts = _cluster_sums(labels, chunk, self.k, chunk_weights)
+        return sums, counts, n_distances
+
+    def _update_bounds(self, prev_centers: np.ndarray):
+        # A center moving by p moves its distance to any pixel by at most p
+        shifts = np.linalg.norm(self.cluster_centers_ - prev_centers, axis=1)
+        self.upper_ += shifts[self.labels_]
+        order = np.argsort(shifts)
+        largest = shifts[order[-1]]
+        second = shifts[order[-2]] if self.k > 1 else 0.0
+        self.lower_ -= np.where(self.labels_ == order[-1], second, largest)
+
+    def _compute_inertia(self, X: np.ndarray, weights: np.ndarray) -> float:
+        chunk_rows = self._chunk_rows(X)
+        inertia = 0.0
+        for start in range(0, X.shape[0], chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            chunk = np.asarray(X[rows], dtype=self.dtype)
+            chunk -= self.cluster_centers_[self.labels_[rows]]
+            distances = np.einsum("ij,ij->i", chunk, chunk)
+            inertia += (
+                np.sum(distances, dtype=np.float64)
+                if weights is None
+                else np.dot(distances, weights[rows])
+            )
+        return inertia
+
+    def _update_labels(self, X: np.ndarray, weights: np.ndarray):
+        self._centers = self.cluster_centers_.astype(self.dtype)
+        if self.algorithm == "hamerly":
+            assign_chunk = self._assign_chunk_hamerly
+            center_gaps = np.linalg.norm(
+                self.cluster_centers_[:, np.newaxis] - self.cluster_centers_, axis=2
+            )
+            np.fill_diagonal(center_gaps, np.inf)
+            self._half_center_gap = np.min(center_gaps, axis=1) / 2
+        else:
+            assign_chunk = self._assign_chunk
+
+        chunk_rows = self._chunk_rows(X)
+        bounds = [
+            (start, min(start + chunk_rows, X.shape[0]))
+            for start in range(0, X.shape[0], chunk_rows)
+        ]
+        if self.n_jobs is not None and self.n_jobs > 1:
+            # numpy releases the GIL in the matrix products and reductions
+            with ThreadPoolExecutor(self.n_jobs) as executor:
+                results = list(
+                    executor.map(lambda b: assign_chunk(X, weights, *b), bounds)
+                )
+        else:
+            results = [assign_chunk(X, weights, *b) for b in bounds]
 
-    def fit(self, X: np.ndarray):
-        self._initialize_centers(X)
+        # Merged in chunk order, so results do not depend on thread timing
+        sums = sum(result[0] for result in results)
+        counts = sum(result[1] for result in results)
+        n_distances = sum(result[2] for result in results)
+        self.n_distances_ += n_distances
+        self.n_distances_skipped_ += X.shape[0] * self.k - n_distances
+        return sums, counts
+
+    def _update_centers(self, X: np.ndarray, sums: np.ndarray, counts: np.ndarray):
+        empty = np.flatnonzero(counts == 0)
+        if len(empty) > 0:
+            # Empty clusters are re-seeded with the points farthest from
+            # their current centers
+            farthest = self._farthest_points(X, len(empty))
+        non_empty = counts > 0
+        self.cluster_centers_[non_empty] = (
+            sums[non_empty] / counts[non_empty, np.newaxis]
+        )
+        if len(empty) > 0:
+            self.cluster_centers_[empty[: len(farthest)]] = X[farthest]
+
+    def _farthest_points(self, X: np.ndarray, n_points: int) -> np.ndarray:
+        chunk_rows = self._chunk_rows(X)
+        distances = np.empty(X.shape[0])
+        for start in range(0, X.shape[0], chunk_rows):
+            rows = slice(start, start + chunk_rows)
+            chunk = np.asarray(X[rows], dtype=self.dtype)
+            chunk -= self.cluster_centers_[self.labels_[rows]]
+            distances[rows] = np.einsum("ij,ij->i", chunk, chunk)
+        n_points = min(n_points, X.shape[0])
+        return np.argpartition(distances, -n_points)[-n_points:]
+
+    def fit(self, X: np.ndarray, sample_weight: np.ndarray = None):
+        if self.n_init > 1:
+            return self._fit_restarts(X, sample_weight)
+
+        if self.color_reduction is not None:
+            bits = self.histogram_bits if self.color_reduction == "histogram" else 8
+            colors, pixel_colors, weights = _reduce_colors(X, bits, sample_weight)
+            # Random centers are drawn from the pixels, so that clustering the
+            # unique colors gives the same palette as clustering every pixel.
+            # Weighted seeding over the colors is equivalent to seeding over
+            # the pixels
+            if isinstance(self.init, str) and self.init == "random":
+                self._initialize_centers(X, sample_weight)
+            else:
+                self._initialize_centers(colors, weights)
+            self._lloyd(colors, weights)
+            # Color labels are mapped back to pixels with a lookup table
+            self.labels_ = self.labels_[pixel_colors]
+        else:
+            self._initialize_centers(X, sample_weight)
+            self._lloyd(X, sample_weight)
+        return self
+
+    def _lloyd(self, X: np.ndarray, weights: np.ndarray):
         self.labels_ = np.full(X.shape[0], -1)
         self.iterations = 0
+        self.converged_ = False
+        # Pixel-center distances computed and skipped over the whole fit
+        self.n_distances_ = 0
+        self.n_distances_skipped_ = 0
+        if self.algorithm == "hamerly":
+            self.upper_ = np.full(X.shape[0], np.inf, dtype=self.dtype)
+            self.lower_ = np.zeros(X.shape[0], dtype=self.dtype)
         prev_centers = np.copy(self.cluster_centers_)
         for _ in range(self.max_iter):
             self.iterations += 1
-            self._update_labels(X)
-            self._update_centers(X)
+            sums, counts = self._update_labels(X, weights)
+            self._update_centers(X, sums, counts)
+            if self.algorithm == "hamerly":
+                self._update_bounds(prev_centers)
             if np.linalg.norm(self.cluster_centers_ - prev_centers) < self.tol:
+                self.converged_ = True
                 break
             prev_centers = np.copy(self.cluster_centers_)
+        # The inertia (clusters cost) is computed once, with respect to the
+        # final centers, for both algorithms
+        self.inertia_ = self._compute_inertia(X, weights)
+
+    def _fit_restarts(self, X: np.ndarray, sample_weight: np.ndarray):
+        # Seeds are drawn from random_state, so the best restart does not
+        # depend on how restarts are scheduled
+        seeds = self.rng.integers(2**32, size=self.n_init)
+        restarts = [
+            KMeans(
+                self.k,
+                tol=self.tol,
+                max_iter=self.max_iter,
+                random_state=seed,
+                chunk_size=self.chunk_size,
+                max_memory=self.max_memory,
+                n_jobs=self.n_jobs,
+                algorithm=self.algorithm,
+                color_reduction=self.color_reduction,
+                histogram_bits=self.histogram_bits,
+                init=self.init,
+                dtype=self.dtype,
+            )
+            for seed in seeds
+        ]
+        if self.n_processes is not None and self.n_processes > 1:
+            with ProcessPoolExecutor(self.n_processes) as executor:
+                restarts = list(
+                    executor.map(
+                        _fit_kmeans, restarts, repeat(X), repeat(sample_weight)
+                    )
+                )
+        else:
+            restarts = [restart.fit(X, sample_weight) for restart in restarts]
+
+        best = min(restarts, key=lambda restart: restart.inertia_)
+        self.cluster_centers_ = best.cluster_centers_
+        self.labels_ = best.labels_
+        self.inertia_ = best.inertia_
+        self.iterations = best.iterations
+        self.converged_ = best.converged_
+        self.n_distances_ = sum(restart.n_distances_ for restart in restarts)
+        self.n_distances_skipped_ = sum(
+            restart.n_distances_skipped_ for restart in restarts
+        )
         return self
 
 
+def _fit_kmeans(kmeans: KMeans, X: np.ndarray, sample_weight: np.ndarray) -> KMeans:
+    return kmeans.fit(X, sample_weight)
+
+
+def _cluster_sums(labels: np.ndarray, X: np.ndarray, k: int, weights: np.ndarray):
+    # Per-cluster (weighted) sums of X and counts, with one bincount each
+    counts = np.bincount(labels, weights=weights, minlength=k)
+    if weights is not None:
+        X = X * weights[:, np.newaxis]
+    sums = np.stack(
+        [np.bincount(labels, weights=X[:, i], minlength=k) for i in range(X.shape[1])],
+        axis=1,
+    )
+    return sums, counts
+
+
+def _reduce_colors(X: np.ndarray, bits: int, sample_weight: np.ndarray):
+    # Collapses 8-bit pixels into the bins of a histogram with the given
+    # bits per channel (8 keeps every unique color). Returns the mean color
+    # and weight of every non-empty bin and the bin of every pixel
+    if not np.issubdtype(X.dtype, np.integer):
+        raise ValueError("Color reduction needs 8-bit integer pixels")
+    shift = 8 - bits
+    keys = np.zeros(X.shape[0], dtype=np.int64)
+    for i in range(X.shape[1]):
+        keys <<= bits
+        keys |= X[:, i] >> shift
+    _, pixel_colors, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    pixel_colors = pixel_colors.ravel()
+    if bits == 8 and sample_weight is None:
+        # Every pixel of a bin has the same color
+        colors = np.empty((len(counts), X.shape[1]), dtype=X.dtype)
+        colors[pixel_colors] = X
+        return colors, pixel_colors, counts
+    sums, weights = _cluster_sums(pixel_colors, X, len(counts), sample_weight)
+    colors = sums / np.maximum(weights, np.finfo(np.float64).tiny)[:, np.newaxis]
+    return colors, pixel_colors, weights
+
+
+class MiniBatchKMeans:
+    def __init__(
+        self,
+        n_clusters: int,
+        random_state: int = 42,
+        reassignment_ratio: float = 0.01,
+    ):
+        self.k = n_clusters
+        self.random_state = random_state
+        # Centers with fewer pixels than reassignment_ratio times the largest
+        # center are moved to random pixels of the current batch, so that
+        # centers seeded from an unrepresentative first batch are not lost
+        self.reassignment_ratio = reassignment_ratio
+        self.rng = np.random.default_rng(random_state)
+        self.cluster_centers_ = None
+        # Pixels assigned to each center so far, which set its learning rate
+        self.counts_ = np.zeros(n_clusters, dtype=np.int64)
+        self.n_batches = 0
+
+    def partial_fit(self, X: np.ndarray):
+        X = np.asarray(X, dtype=np.float64)
+        if self.cluster_centers_ is None:
+            if X.shape[0] < self.k:
+                raise ValueError(
+                    f"The first batch has {X.shape[0]} pixels, "
+                    f"at least {self.k} are needed"
+                )
+            self.cluster_centers_ = self.rng.choice(X, size=self.k, replace=False)
+        self.n_batches += 1
+
+        # Every center moves towards the mean of its batch pixels with
+        # learning rate batch_count / total_count, i.e., it stays the mean of
+        # all the pixels ever assigned to it
+        labels, _ = _closest_centers(X, self.cluster_centers_)
+        sums, counts = _cluster_sums(labels, X, self.k, None)
+        counts = counts.astype(np.int64)
+        self.counts_ += counts
+        updated = counts > 0
+        self.cluster_centers_[updated] += (
+            sums[updated] - counts[updated, np.newaxis] * self.cluster_centers_[updated]
+        ) / self.counts_[updated, np.newaxis]
+
+        starving = self.counts_ < self.reassignment_ratio * np.max(self.counts_)
+        n_starving = min(np.count_nonzero(starving), X.shape[0])
+        if n_starving > 0:
+            reseeded = np.flatnonzero(starving)[:n_starving]
+            self.cluster_centers_[reseeded] = self.rng.choice(
+                X, size=n_starving, replace=False
+            )
+            self.counts_[reseeded] = np.min(self.counts_[~starving])
+        return self
+
+    def fit(self, batches):
+        # batches is any iterable of (n_pixels, 3) arrays, e.g. a generator
+        # from image.iter_pixel_batches
+        for X in batches:
+            self.partial_fit(X)
+        return self
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        labels, _ = _closest_centers(
+            np.asarray(X, dtype=np.float64), self.cluster_centers_
+        )
+        return labels
+
+    def predict_stream(self, batches):
+        # Final assignment pass: yields the labels of every batch and
+        # accumulates the inertia of the whole stream
+        self.inertia_ = 0.0
+        for X in batches:
+            labels, distances = _closest_centers(
+                np.asarray(X, dtype=np.float64), self.cluster_centers_
+            )
+            self.inertia_ += np.sum(distances)
+            yield labels
+
+
+def _closest_centers(X: np.ndarray, centers: np.ndarray):
+    # Returns the closest center of each pixel and its squared distance
+    distances = X @ centers.T
+    distances *= -2
+    distances += np.einsum("ij,ij->i", centers, centers)
+    labels = np.argmin(distances, axis=1)
+    closest = distances[np.arange(len(labels)), labels]
+    closest += np.einsum("ij,ij->i", X, X)
+    return labels, np.maximum(closest, 0)
+
+
+def sweep_k(
+    X: np.ndarray,
+    k_values: list[int],
+    color_reduction: str = "unique",
+    histogram_bits: int = 5,
+    warm_start: bool = True,
+    n_processes: int = None,
+    **kmeans_params,
+):
+    # Fits KMeans for every k in k_values and returns the clusters cost
+    # (inertia) and fit time of each k, ready for plot_k_metrics, and the
+    # centers of each k. The pixels are reduced to unique colors (or to a
+    # histogram, whose cost then ignores the spread of the pixels of each
+    # bin) once for all the fits. With warm_start, every k starts from the
+    # centers of the previous k, splitting the clusters with the highest
+    # cost. The sorted k values are split into n_processes contiguous
+    # chains, fitted in parallel processes
+    bits = histogram_bits if color_reduction == "histogram" else 8
+    if color_reduction is None:
+        colors, weights = X, None
+    else:
+        colors, _, weights = _reduce_colors(X, bits, None)
+
+    order = np.argsort(k_values)
+    sorted_k = [k_values[i] for i in order]
+    if not warm_start:
+        chains = [[k] for k in sorted_k]
+    elif n_processes is not None and n_processes > 1:
+        chains = [list(chain) for chain in np.array_split(sorted_k, n_processes)]
+    else:
+        chains = [sorted_k]
+    chains = [chain for chain in chains if len(chain) > 0]
+
+    if n_processes is not None and n_processes > 1:
+        with ProcessPoolExecutor(n_processes) as executor:
+            results = list(
+                executor.map(
+                    _sweep_chain,
+                    repeat(colors),
+                    repeat(weights),
+                    chains,
+                    repeat(kmeans_params),
+                )
+            )
+    else:
+        results = [
+            _sweep_chain(colors, weights, chain, kmeans_params) for chain in chains
+        ]
+
+    costs, times, centers = np.empty(len(k_values)), np.empty(len(k_values)), []
+    for result in results:
+        centers += result[2]
+    sorted_costs = np.concatenate([result[0] for result in results])
+    sorted_times = np.concatenate([result[1] for result in results])
+    costs[order], times[order] = sorted_costs, sorted_times
+    centers = [centers[i] for i in np.argsort(order)]
+    return costs, times, centers
+
+
+def _sweep_chain(
+    X: np.ndarray, weights: np.ndarray, k_values: list[int], kmeans_params: dict
+):
+    # Fits increasing k values, each one warm-started from the previous one
+    costs, times, centers = [], [], []
+    kmeans = None
+    for k in k_values:
+        start = perf_counter()
+        params = dict(kmeans_params)
+        if kmeans is not None:
+            params["init"] = _split_clusters(kmeans, X, weights, k)
+        kmeans = KMeans(k, **params).fit(X, weights)
+        times.append(perf_counter() - start)
+        costs.append(kmeans.inertia_)
+        centers.append(kmeans.cluster_centers_)
+    return costs, times, centers
+
+
+def _split_clusters(
+    kmeans: KMeans, X: np.ndarray, weights: np.ndarray, k: int
+) -> np.ndarray:
+    # Splits the cluster with the highest cost into two centers one
+    # standard deviation apart, until there are k centers. A split cluster
+    # is assumed to leave half of its cost to each half
+    centers = list(kmeans.cluster_centers_)
+    deviations = X - kmeans.cluster_centers_[kmeans.labels_]
+    squares, counts = _cluster_sums(kmeans.labels_, deviations**2, kmeans.k, weights)
+    stds = list(np.sqrt(squares / np.maximum(counts, 1)[:, np.newaxis]))
+    costs = list(np.sum(squares, axis=1))
+    while len(centers) < k:
+        j = int(np.argmax(costs))
+        costs[j] /= 2
+        stds[j] = stds[j] / 2
+        centers.append(centers[j] + stds[j])
+        centers[j] = centers[j] - stds[j]
+        costs.append(costs[j])
+        stds.append(stds[j])
+    return np.array(centers[:k])
+
+
 def plot_k_metrics(
     k_values: list[int],
     clusters_cost_list: list[float],
@@ -0,0 +1,71 @@
+import numpy as np
+from src.image import Image
+
+
+class Palette:
+    def __init__(
+        self,
+        cluster_centers: np.ndarray,
+        bits: int = 5,
+        max_memory: int = 256 * 2**20,
+    ):
+        if len(cluster_centers) > 256:
+            raise ValueError("A palette has at most 256 colors")
+        self.colors = np.uint8(np.clip(np.rint(cluster_centers), 0, 255))
+        # Every channel is truncated to its bits most significant bits, so the
+        # lookup table has 2^(3 * bits) entries (32^3 for 5 bits). With 8
+        # bits the table covers every 8-bit color and the lookup is exact
+        self.bits = bits
+        # Bins per chunk while building the table. It is derived from
+        # max_memory (in bytes), so that peak memory does not depend on the
+        # number of colors
+        self.max_memory = max_memory
+        self.lut = self._build_lut(np.float64(cluster_centers))
+
+    def _build_lut(self, centers: np.ndarray) -> np.ndarray:
+        # Nearest center of the middle color of every bin, computed in
+        # chunks of bins. The table stores the palette color itself, so
+        # quantizing is a single lookup
+        n_levels = 2**self.bits
+        levels = (np.arange(n_levels) + 0.5) * 2 ** (8 - self.bits) - 0.5
+        center_norms = np.einsum("ij,ij->i", centers, centers)
+        lut = np.empty((n_levels**3, 3), dtype=np.uint8)
+        # The float64 distances of a bin to every center, plus its key, color
+        # and label, with their temporaries
+        row_bytes = np.dtype(np.float64).itemsize * (len(centers) + 12)
+        chunk_rows = min(max(1, self.max_memory // row_bytes), n_levels**3)
+        # The distance buffer is reused by every chunk
+        buffer = np.empty((chunk_rows, len(centers)))
+        for start in range(0, n_levels**3, chunk_rows):
+            keys = np.arange(start, min(start + chunk_rows, n_levels**3))
+            bins = np.stack(
+                [
+                    levels[keys >> 2 * self.bits],
+                    levels[(keys >> self.bits) & (n_levels - 1)],
+                    levels[keys & (n_levels - 1)],
+                ],
+                axis=1,
+            )
+            distances = np.matmul(bins, centers.T, out=buffer[: len(keys)])
+            distances *= -2
+            distances += center_norms
+            lut[keys] = self.colors[np.argmin(distances, axis=1)]
+        return lut
+
+    def quantize_rgb(self, rgb: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        # rgb is a (..., 3) uint8 array, e.g. a video frame. Passing out
+        # reuses its buffer across frames
+        if rgb.dtype != np.uint8:
+            raise ValueError("The palette is applied to 8-bit images")
+        shift = 8 - self.bits
+        keys = np.right_shift(rgb[..., 0], shift, dtype=np.uint32)
+        keys <<= self.bits
+        keys |= rgb[..., 1] >> shift
+        keys <<= self.bits
+        keys |= rgb[..., 2] >> shift
+        if out is None:
+            out = np.empty(rgb.shape, dtype=np.uint8)
+        return np.take(self.lut, keys, axis=0, out=out, mode="clip")
+
+    def quantize(self, image: Image) -> Image:
+        return Image(self.quantize_rgb(image.rgb_matrix), image.title)
@@ -0,0 +1,40 @@
+"""
+Measures the construction time of Environment for square maps of growing
+size. Run from the remote_island_journey folder with:
+
+    python -m benchmarks.environment_construction
+"""
+
+import numpy as np
+from time import perf_counter
+from src.environment import Environment
+from src.map_config import BLOCK_ID
+
+MAP_SIZES = [10, 100, 500, 1000, 2000, 4000]
+
+
+def random_map(size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    map = rng.choice(
+        [BLOCK_ID["open_field"], BLOCK_ID["forest"], BLOCK_ID["mountain"]],
+        size=(size, size),
+        p=[0.6, 0.25, 0.15],
+    ).astype(np.uint8)
+    map[0, 0] = BLOCK_ID["start"]
+    map[-1, -1] = BLOCK_ID["end"]
+    return map
+
+
+def main():
+    print(f"{'map size':>10} {'states':>12} {'seconds':>10}")
+    for size in MAP_SIZES:
+        map = random_map(size)
+        start = perf_counter()
+        env = Environment(map)
+        elapsed = perf_counter() - start
+        print(f"{size:>10} {len(env.S):>12} {elapsed:>10.4f}")
+        del env
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Checks that incremental re-solves after random map edits match a fresh
+value iteration, and compares their time. Run from the
+remote_island_journey folder with:
+
+    python -m benchmarks.incremental_resolve
+"""
+
+import numpy as np
+from time import perf_counter
+from src.environment import Environment
+from src.map_config import BLOCK_ID
+from src import solvers
+
+GAMMAS = [1.0, 0.9]
+MAP_SIZE = 30
+N_MAPS = 20
+N_EDITS = 10
+TOL = 1e-10
+# Both solves stop within about tol / (1 - gamma) of the optimal values
+MAX_ERROR = 1e-6
+
+
+def random_map(size: int, rng: np.random.Generator):
+    map = rng.choice(
+        [BLOCK_ID["open_field"], BLOCK_ID["forest"], BLOCK_ID["mountain"]],
+        size=(size, size),
+        p=[0.55, 0.25, 0.2],
+    ).astype(np.uint8)
+    map[0, 0] = BLOCK_ID["start"]
+    map[-1, -1] = BLOCK_ID["end"]
+    return map
+
+
+def random_edit(env: Environment, rng: np.random.Generator):
+    # Edits never touch the last cell, so a terminal state always remains
+    n_cells = rng.integers(1, 4)
+    coords = rng.integers(0, env.map_size, size=(n_cells, 2))
+    coords = coords[np.any(coords != env.map_size - 1, axis=1)]
+    block_ids = rng.choice(
+        [
+            BLOCK_ID["open_field"],
+            BLOCK_ID["forest"],
+            BLOCK_ID["mountain"],
+            BLOCK_ID["end"],
+        ],
+        size=len(coords),
+    )
+    return env.update_cells(coords, block_ids)
+
+
+def main():
+    print(
+        f"{'gamma':>6} {'edits':>6} {'max error':>10} {'incremental s':>14} {'fresh s':>8}"
+    )
+    for gamma in GAMMAS:
+        rng = np.random.default_rng(0)
+        worst, incremental_time, fresh_time = 0.0, 0.0, 0.0
+        for _ in range(N_MAPS):
+            env = Environment(random_map(MAP_SIZE, rng))
+            V, actions, _ = solvers.value_iteration(env, gamma, tol=TOL)
+            for _ in range(N_EDITS):
+                states = random_edit(env, rng)
+
+                start = perf_counter()
+                V, actions, _ = solvers.incremental_value_iteration(
+                    env, V, states, gamma, tol=TOL, actions=actions
+                )
+                incremental_time += perf_counter() - start
+
+                start = perf_counter()
+                fresh_V, _, _ = solvers.value_iteration(env, gamma, tol=TOL)
+                fresh_time += perf_counter() - start
+
+                error = np.max(np.abs(V - fresh_V))
+                assert error <= MAX_ERROR, f"re-solve differs by {error}"
+                worst = max(worst, error)
+        print(
+            f"{gamma:>6} {N_MAPS * N_EDITS:>6} {worst:>10.2e} "
+            f"{incremental_time:>14.4f} {fresh_time:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import numpy as np
+from time import perf_counter
+from multiprocessing import Pool
+from src.environment import Environment
+
+
+def batch_value_iteration(
+    maps: list,
+    penalizations: list = None,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_iter: int = 10_000,
+    n_jobs: int = None,
+):
+    """
+    Solves many island maps at once with value iteration. Maps of the same \
+    size are stacked and every iteration applies the Bellman optimality \
+    update to all of their states together. Groups of maps with different \
+    sizes can be solved in parallel processes.
+
+    Parameters:
+        maps (list): The maps to solve.
+        penalizations (list): The block penalization dictionary of each map \
+            (see map_config.BLOCK_PENALIZATION), e.g., to sweep penalty \
+            configurations over the same map. Defaults to \
+            map_config.BLOCK_PENALIZATION for every map.
+        gamma (float): The discount factor.
+        tol (float): The iteration of a group stops when \
+            max_s |V_k(s) - V_k+1(s)| is below this threshold for all of its \
+            maps.
+        max_iter (int): The maximum number of iterations.
+        n_jobs (int): The number of processes used to solve the groups of \
+            maps with different sizes. Defaults to solving them in the \
+            current process.
+
+    Returns:
+        tuple: The value function of each map, the greedy action of each \
+        state of each map and the throughput in maps per second.
+    """
+    start = perf_counter()
+    if penalizations is None:
+        penalizations = [None] * len(maps)
+    assert len(penalizations) == len(maps)
+
+    # Group maps by size, keeping track of their position
+    groups = {}
+    for i, map in enumerate(maps):
+        groups.setdefault(np.shape(map), []).append(i)
+    tasks = [
+        ([maps[i] for i in indices], [penalizations[i] for i in indices])
+        for indices in groups.values()
+    ]
+    args = [(*task, gamma, tol, max_iter) for task in tasks]
+
+    if n_jobs is not None and n_jobs > 1 and len(tasks) > 1:
+        with Pool(min(n_jobs, len(tasks))) as pool:
+            results = pool.starmap(_solve_stacked_maps, args)
+    else:
+        results = [_solve_stacked_maps(*task_args) for task_args in args]
+
+    Vs, policies = [None] * len(maps), [None] * len(maps)
+    for indices, (V, actions) in zip(groups.values(), results):
+        for i, map_V, map_actions in zip(indices, V, actions):
+            Vs[i], policies[i] = map_V, map_actions
+
+    elapsed = perf_counter() - start
+    return Vs, policies, len(maps) / elapsed
+
+
+def _solve_stacked_maps(
+    maps: list, penalizations: list, gamma: float, tol: float, max_iter: int
+):
+    """
+    Runs value iteration on maps of the same size stacked together.
+
+    Parameters:
+        maps (list): The maps to solve.
+        penalizations (list): The block penalization of each map, or None.
+        gamma (float): The discount factor.
+        tol (float): The convergence threshold.
+        max_iter (int): The maximum number of iterations.
+
+    Returns:
+        tuple: The (n_maps, |S|) value functions and greedy actions.
+    """
+    envs = [
+        Environment(map, penalization) for map, penalization in zip(maps, penalizations)
+    ]
+    n_states = len(envs[0].S)
+    next_state = np.stack([env.next_state.T for env in envs])
+    reward = np.stack([env.reward.T for env in envs])
+    Q = np.empty(reward.shape)
+
+    # Only the maps that have not converged yet are iterated. Their value
+    # functions are gathered from a single flat array, so the next states of
+    # each active map are offset by its position
+    V = np.zeros((len(envs), n_states))
+    active = np.arange(len(envs))
+    done = np.zeros(len(envs), dtype=bool)
+    active_V = V
+    active_next_state = next_state + _stack_offsets(len(envs), n_states)
+    active_reward = reward
+    for _ in range(max_iter):
+        active_Q = Q[: len(active)]
+        _stacked_q_values(active_V, active_next_state, active_reward, gamma, active_Q)
+        new_V = np.max(active_Q, axis=1)
+        converged = np.max(np.abs(new_V - active_V), axis=1) < tol
+        active_V = new_V
+
+        # Converged maps keep their value function, but are only dropped
+        # from the stack once enough of them piled up, since every drop
+        # copies the tables of the remaining maps
+        converged &= ~done[active]
+        V[active[converged]] = active_V[converged]
+        done[active[converged]] = True
+        if np.all(done):
+            break
+        if np.count_nonzero(done[active]) * 2 >= len(active):
+            keep = ~done[active]
+            active, active_V = active[keep], active_V[keep]
+            active_next_state = next_state[active] + _stack_offsets(
+                len(active), n_states
+            )
+            active_reward = reward[active]
+    keep = ~done[active]
+    V[active[keep]] = active_V[keep]
+
+    _stacked_q_values(
+        V, next_state + _stack_offsets(len(envs), n_states), reward, gamma, Q
+    )
+    return V, np.argmax(Q, axis=1)
+
+
+def _stack_offsets(n_maps: int, n_states: int):
+    """
+    Computes the offset of each stacked map in the flattened value functions.
+
+    Parameters:
+        n_maps (int): The number of stacked maps.
+        n_states (int): The number of states of each map.
+
+    Returns:
+        np.ndarray: A (n_maps, 1, 1) array of offsets.
+    """
+    return np.arange(n_maps)[:, np.newaxis, np.newaxis] * n_states
+
+
+def _stacked_q_values(
+    V: np.ndarray,
+    next_state: np.ndarray,
+    reward: np.ndarray,
+    gamma: float,
+    out: np.ndarray,
+):
+    """
+    Computes the action values of stacked maps.
+
+    Parameters:
+        V (np.ndarray): The (n_maps, |S|) value functions.
+        next_state (np.ndarray): The (n_maps, |A|, |S|) offset next states.
+        reward (np.ndarray): The (n_maps, |A|, |S|) rewards.
+        gamma (float): The discount factor.
+        out (np.ndarray): The (n_maps, |A|, |S|) buffer to write into.
+    """
+    np.take(V, next_state, out=out, mode="clip")
+    if gamma != 1:
+        out *= gamma
+    out += reward
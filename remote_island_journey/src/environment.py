@@ -1,4 +1,5 @@
 import numpy as np
+from functools import cached_property
 from src.map_config import BLOCK_PENALIZATION, BLOCK_ID
 
 
@@ -13,10 +14,16 @@ class Environment:
         current_state (np.ndarray): The current state of the environment.
         final_state (np.ndarray): The final state of the environment.
         S (np.ndarray): An array of all possible states.
-        S_coords (np.ndarray): An array of coordinates for each state.
+        S_coords (np.ndarray): An array of coordinates for each state, \
+            computed on first access.
         initial_s (int): The initial state index.
         S_terminal (np.ndarray): An array of terminal state indices.
         A (list): A list of all possible actions.
+        block_penalization (dict): The reward of moving into each block.
+        next_state (np.ndarray): A (|S|, |A|) table with the next state \
+            reached by applying each action to each state.
+        reward (np.ndarray): A (|S|, |A|) table with the reward obtained by \
+            applying each action to each state.
     """
 
     ACTIONS = {
@@ -26,18 +33,106 @@ class Environment:
         "left": 3,
     }
 
-    def __init__(self, map: np.ndarray):
+    ACTION_OFFSETS = {
+        "up": (-1, 0),
+        "down": (1, 0),
+        "right": (0, 1),
+        "left": (0, -1),
+    }
+
+    _OPPOSITE_ACTION = {
+        "up": "down",
+        "down": "up",
+        "right": "left",
+        "left": "right",
+    }
+
+    def __init__(self, map: np.ndarray, block_penalization: dict = None):
+        if np.ndim(map) != 2 or np.shape(map)[0] != np.shape(map)[1]:
+            raise ValueError(f"The map must be square, got shape {np.shape(map)}")
         self.map = map
+        self.block_penalization = (
+            BLOCK_PENALIZATION if block_penalization is None else block_penalization
+        )
         self.map_size = len(map)
         self.current_state = np.array((0, 0))
         self.final_state = np.array((len(map) - 1, len(map) - 1))
-        self.S = np.array([i for i in range(len(map) ** 2)])
-        self.S_coords = np.array(
-            [[i, j] for j in range(len(map)) for i in range(len(map))]
-        )  # Note that len(S) = len(S_coords)
+        self.S = np.arange(len(map) ** 2)
         self.initial_s = self._get_initial_state()
         self.S_terminal = self._get_terminal_states()
         self.A = list(__class__.ACTIONS.values())
+        self.next_state, self.reward = self._build_transition_tables()
+
+    @cached_property
+    def S_coords(self):
+        """
+        The (row, column) coordinates of each state, such that \
+        len(S) = len(S_coords).
+        """
+        return np.stack(self.get_coords_from_state(self.S), axis=1)
+
+    def _build_transition_tables(self):
+        """
+        Precomputes the next state and reward of every (state, action) pair.
+
+        Returns:
+            tuple: The (|S|, |A|) next state table and the (|S|, |A|) reward \
+            table.
+        """
+        return self._compute_transitions(self.S)
+
+    def _compute_transitions(self, states: np.ndarray):
+        """
+        Computes the next state and reward of applying every action to the \
+        given states.
+
+        Parameters:
+            states (np.ndarray): The states.
+
+        Returns:
+            tuple: The (len(states), |A|) next states and rewards, stored \
+            column-major so that the values of each action are contiguous, \
+            which is the layout whole-state-space updates iterate over.
+        """
+        map = np.asarray(self.map)
+        next_state = self._get_neighbors(states)
+
+        # The reward depends on the block the agent moves to
+        penalization = _penalization_lookup_table(self.block_penalization)
+        reward = np.empty(next_state.shape, order="F")
+        for action in self.A:
+            rows, cols = self.get_coords_from_state(next_state[:, action])
+            reward[:, action] = penalization[map[rows, cols]]
+
+        # Terminal states are absorbing
+        rows, cols = self.get_coords_from_state(states)
+        is_terminal = map[rows, cols] == BLOCK_ID["end"]
+        next_state[is_terminal] = states[is_terminal, np.newaxis]
+        reward[is_terminal] = self.block_penalization[BLOCK_ID["end"]]
+
+        return next_state, reward
+
+    def _get_neighbors(self, states: np.ndarray):
+        """
+        Computes the states reached by applying every action to the given \
+        states, regardless of whether they are terminal.
+
+        Parameters:
+            states (np.ndarray): The states.
+
+        Returns:
+            np.ndarray: A column-major (len(states), |A|) array of states.
+        """
+        rows, cols = self.get_coords_from_state(states)
+        last = self.map_size - 1
+        neighbors = np.empty((len(states), len(self.A)), dtype=int, order="F")
+        for name, action in __class__.ACTIONS.items():
+            # Moving outside the map leaves the agent on the same state
+            i, j = __class__.ACTION_OFFSETS[name]
+            next_rows = np.clip(rows + i, 0, last)
+            next_cols = np.clip(cols + j, 0, last)
+            neighbors[:, action] = self.get_state_from_coords((next_rows, next_cols))
+        return neighbors
 
     def _get_initial_state(self):
         """
@@ -46,11 +141,9 @@ class Environment:
         Returns:
             int: The index of the initial state.
         """
-        for s in self.S:
-            coords = self.S_coords[s]
-            state_value = self.map[coords[0]][coords[1]]
-            if state_value == BLOCK_ID["start"]:
-                return s
+        states = self._get_block_states(BLOCK_ID["start"])
+        if len(states) > 0:
+            return states[0]
 
     def _get_terminal_states(self):
         """
@@ -59,13 +152,20 @@ class Environment:
         Returns:
             np.ndarray: An array of terminal state indices.
         """
-        terminal_states = []
-        for s in self.S:
-            coords = self.S_coords[s]
-            state_value = self.map[coords[0]][coords[1]]
-            if state_value == BLOCK_ID["end"]:
-                terminal_states.append(s)
-        return np.array(terminal_states)
+        return self._get_block_states(BLOCK_ID["end"])
+
+    def _get_block_states(self, block_id: int):
+        """
+        Identifies all states of a given block.
+
+        Parameters:
+            block_id (int): The block id.
+
+        Returns:
+            np.ndarray: The sorted array of state indices.
+        """
+        rows, cols = np.nonzero(np.asarray(self.map) == block_id)
+        return np.sort(self.get_state_from_coords((rows, cols)))
 
     def get_state_from_coords(self, state_coords: np.ndarray):
         """
@@ -79,6 +179,134 @@ class Environment:
         """
         return state_coords[0] + state_coords[1] * self.map_size
 
+    def get_coords_from_state(self, state: int):
+        """
+        Converts a state index to the corresponding coordinates.
+
+        Parameters:
+            state (int): The index of the state. An array of indices is \
+                converted elementwise.
+
+        Returns:
+            tuple: The row and column of the state.
+        """
+        return state % self.map_size, state // self.map_size
+
+    def get_predecessors(self, state: int):
+        """
+        Identifies the states that reach a given state by applying some \
+        action, without building the full predecessor index (see \
+        predecessor_index).
+
+        Parameters:
+            state (int): The state.
+
+        Returns:
+            list: The predecessor states.
+        """
+        # Plain Python arithmetic, since this is called once per state by
+        # local searches
+        row, col = self.get_coords_from_state(state)
+        last = self.map_size - 1
+        predecessors = []
+        for name, (i, j) in __class__.ACTION_OFFSETS.items():
+            coords = (min(max(row + i, 0), last), min(max(col + j, 0), last))
+            neighbor = self.get_state_from_coords(coords)
+            # The neighbor reaches the state with the opposite action
+            action = __class__.ACTIONS[__class__._OPPOSITE_ACTION[name]]
+            if neighbor != state and self.next_state[neighbor, action] == state:
+                predecessors.append(neighbor)
+        return predecessors
+
+    def update_cells(self, coords: np.ndarray, block_ids: np.ndarray):
+        """
+        Changes the blocks of some cells of the map and patches the \
+        transition tables, terminal states and initial state in place. Only \
+        the changed cells and the states that move into them are recomputed. \
+        The map must be writable, e.g., a memory-mapped map has to be \
+        loaded with mmap_mode="c" or "r+".
+
+        Parameters:
+            coords (np.ndarray): The (row, column) coordinates of the cells.
+            block_ids (np.ndarray): The new block id of each cell.
+
+        Returns:
+            np.ndarray: The states whose transitions changed.
+        """
+        coords = np.atleast_2d(coords)
+        self.map[coords[:, 0], coords[:, 1]] = block_ids
+        block_ids = np.asarray(self.map)[coords[:, 0], coords[:, 1]]
+        states = self.get_state_from_coords(coords.T)
+
+        # Update terminal and initial states
+        is_end = block_ids == BLOCK_ID["end"]
+        self.S_terminal = np.union1d(
+            np.setdiff1d(self.S_terminal, states[~is_end]), states[is_end]
+        ).astype(int)
+        # Like _get_initial_state, the start cell with the lowest state index
+        # is the initial state
+        is_start = block_ids == BLOCK_ID["start"]
+        if self.initial_s is not None and self.initial_s in states[~is_start]:
+            # The start cell was overwritten, other start cells may remain
+            self.initial_s = self._get_initial_state()
+        elif np.any(is_start):
+            starts = states[is_start]
+            if self.initial_s is not None:
+                starts = np.append(starts, self.initial_s)
+            self.initial_s = np.min(starts)
+
+        # Patch the changed cells and the states that move into them
+        affected = np.union1d(states, self._get_neighbors(states))
+        self.next_state[affected], self.reward[affected] = self._compute_transitions(
+            affected
+        )
+        return affected
+
+    def predecessor_index(self):
+        """
+        Builds the predecessor index of the transition model, i.e., for \
+        each state, the states that reach it by applying some action. \
+        Self-transitions are left out.
+
+        Returns:
+            tuple: An index pointer array of length |S| + 1 and an array of \
+            predecessor states, such that the predecessors of state s are \
+            pred[indptr[s]:indptr[s + 1]].
+        """
+        states = np.repeat(self.S, len(self.A))
+        next_states = np.ravel(self.next_state, order="C")
+        moves = states != next_states
+        states, next_states = states[moves], next_states[moves]
+
+        order = np.argsort(next_states, kind="stable")
+        indptr = np.zeros(len(self.S) + 1, dtype=int)
+        np.cumsum(np.bincount(next_states, minlength=len(self.S)), out=indptr[1:])
+        return indptr, states[order]
+
+    def transition_matrix(self):
+        """
+        Exports the transition model as a sparse matrix. Row s * |A| + a \
+        of the matrix holds the probability of reaching each state after \
+        applying action a to state s. Requires scipy.
+
+        Returns:
+            tuple: The (|S| * |A|, |S|) transition matrix in CSR format and \
+            the aligned reward vector of length |S| * |A|.
+        """
+        from scipy.sparse import csr_matrix
+
+        n_rows = len(self.S) * len(self.A)
+        P = csr_matrix(
+            (
+                np.ones(n_rows),
+                np.ravel(self.next_state, order="C"),
+                np.arange(n_rows + 1),
+            ),
+            shape=(n_rows, len(self.S)),
+        )
+        R = np.ravel(self.reward, order="C")
+        return P, R
+
     def step(self, state: int, action: int):
         """
         Applies an action to a given state and returns the resulting next \
@@ -92,40 +320,38 @@ class Environment:
             tuple: The next state and the reward.
         """
         assert action in self.A
+        return self.next_state[state, action], self.reward[state, action]
 
-        # If state is terminal, stay on the same state
-        if state in self.S_terminal:
-            return state, BLOCK_PENALIZATION[BLOCK_ID["end"]]
-
-        # Compute next state
-        state_coords = self.S_coords[state]
-        if action == self.ACTIONS["up"]:
-            if state_coords[0] == 0:
-                next_state_coords = state_coords
-            else:
-                next_state_coords = state_coords + np.array([-1, 0])
-
-        if action == self.ACTIONS["down"]:
-            if state_coords[0] == self.map_size - 1:
-                next_state_coords = state_coords
-            else:
-                next_state_coords = state_coords + np.array([1, 0])
-
-        if action == self.ACTIONS["right"]:
-            if state_coords[1] == self.map_size - 1:
-                next_state_coords = state_coords
-            else:
-                next_state_coords = state_coords + np.array([0, 1])
-
-        if action == self.ACTIONS["left"]:
-            if state_coords[1] == 0:
-                next_state_coords = state_coords
-            else:
-                next_state_coords = state_coords + np.array([0, -1])
-        next_state = self.get_state_from_coords(next_state_coords)
-
-        # Compute reward
-        next_state_value = self.map[next_state_coords[0]][next_state_coords[1]]
-        reward = BLOCK_PENALIZATION[next_state_value]
+    def step_many(self, states: np.ndarray, actions: np.ndarray):
+        """
+        Applies a batch of actions to a batch of states. States and actions \
+        are broadcast against each other, so a single action can be applied \
+        to many states and vice versa.
 
-        return next_state, reward
+        Parameters:
+            states (np.ndarray): The current states.
+            actions (np.ndarray): The actions to be applied.
+
+        Returns:
+            tuple: The next states and the rewards, both with the broadcast \
+            shape of states and actions.
+        """
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        return self.next_state[states, actions], self.reward[states, actions]
+
+
+def _penalization_lookup_table(block_penalization: dict):
+    """
+    Builds an array mapping each block id to its penalization.
+
+    Parameters:
+        block_penalization (dict): The penalization of each block id.
+
+    Returns:
+        np.ndarray: The penalization of each block id.
+    """
+    penalization = np.zeros(max(block_penalization) + 1)
+    for block_id, value in block_penalization.items():
+        penalization[block_id] = value
+    return penalization
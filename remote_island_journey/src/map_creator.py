@@ -3,6 +3,7 @@ import numpy as np
 import tkinter as tk
 from tkinter import simpledialog, messagebox
 from src.map_config import BLOCK_COLOR, BLOCK_ID
+from src.map_io import MAP_DTYPE, save_map
 
 MAP_FOLDER = "map"
 
@@ -17,7 +18,7 @@ class MapCreatorApp:
         self.map_folder = map_folder
 
         # Initialize the map
-        self.map = np.zeros((self.n, self.n), dtype=int)
+        self.map = np.zeros((self.n, self.n), dtype=MAP_DTYPE)
         self.cell_size = 30
 
         # Track the positions of start and end blocks
@@ -129,7 +130,7 @@ class MapCreatorApp:
         filename = simpledialog.askstring("Save map", "Enter the filename to save:")
         if filename:
             file_path = f"{self.map_folder}/{filename}.npy"
-            np.save(file_path, self.map)
+            save_map(file_path, self.map)
         self.root.quit()
 
 
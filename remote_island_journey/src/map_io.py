@@ -0,0 +1,153 @@
+import numpy as np
+
+MAP_DTYPE = np.uint8
+TILE_PADDING = np.iinfo(MAP_DTYPE).max
+
+
+def save_map(file_path: str, map: np.ndarray):
+    """
+    Saves a map as a .npy file with one byte per cell.
+
+    Parameters:
+        file_path (str): The path of the .npy file.
+        map (np.ndarray): The map to save.
+    """
+    np.save(file_path, np.asarray(map, dtype=MAP_DTYPE))
+
+
+def load_map(file_path: str, mmap_mode: str = "r"):
+    """
+    Loads a map saved as a .npy file. By default the file is memory-mapped, \
+    so cells are only read from disk when accessed.
+
+    Parameters:
+        file_path (str): The path of the .npy file.
+        mmap_mode (str): The numpy memory-map mode ("r", "r+" or "c"), or \
+            None to load the whole map into memory.
+
+    Returns:
+        np.ndarray: The map.
+    """
+    return np.load(file_path, mmap_mode=mmap_mode)
+
+
+def save_tiled_map(file_path: str, map: np.ndarray, tile_size: int = 256):
+    """
+    Saves a map as a .npy file in tiled layout, i.e., as an array of shape \
+    (n_tile_rows, n_tile_columns, tile_size, tile_size) where every tile is \
+    contiguous on disk. Border tiles are padded with TILE_PADDING. The map \
+    is written tile by tile, so it can itself be a memory-mapped array.
+
+    Parameters:
+        file_path (str): The path of the .npy file.
+        map (np.ndarray): The map to save.
+        tile_size (int): The number of rows/columns of each tile.
+    """
+    n_tiles = -(-len(map) // tile_size)
+    tiles = np.lib.format.open_memmap(
+        file_path,
+        mode="w+",
+        dtype=MAP_DTYPE,
+        shape=(n_tiles, n_tiles, tile_size, tile_size),
+    )
+    for i in range(n_tiles):
+        for j in range(n_tiles):
+            block = map[
+                i * tile_size : (i + 1) * tile_size,
+                j * tile_size : (j + 1) * tile_size,
+            ]
+            tiles[i, j] = TILE_PADDING
+            tiles[i, j, : block.shape[0], : block.shape[1]] = block
+    tiles.flush()
+
+
+class TiledMap:
+    """
+    The TiledMap class gives access to a map saved with save_tiled_map \
+    without loading it into memory. Tiles, or any window of the map, are \
+    read from disk on demand.
+
+    Attributes:
+        tiles (np.ndarray): The memory-mapped tiles.
+        tile_size (int): The number of rows/columns of each tile.
+        n_tiles (int): The number of tiles per row/column.
+        map_size (int): The size of the map (number of rows/columns).
+    """
+
+    def __init__(self, file_path: str):
+        self.tiles = np.load(file_path, mmap_mode="r")
+        self.n_tiles = self.tiles.shape[0]
+        self.tile_size = self.tiles.shape[2]
+
+        # Only the last tile of each row is padded
+        last_tile_row = self.tiles[0, -1, 0]
+        self.map_size = (self.n_tiles - 1) * self.tile_size + int(
+            np.count_nonzero(last_tile_row != TILE_PADDING)
+        )
+
+    def tile(self, i: int, j: int):
+        """
+        Reads a tile, without its padding. Tiles on the last row or column \
+        of a map whose size is not a multiple of tile_size are not square, \
+        so they cannot be passed to Environment, which only supports square \
+        maps.
+
+        Parameters:
+            i (int): The tile row.
+            j (int): The tile column.
+
+        Returns:
+            np.ndarray: The cells of the tile.
+        """
+        rows = min(self.tile_size, self.map_size - i * self.tile_size)
+        cols = min(self.tile_size, self.map_size - j * self.tile_size)
+        return np.asarray(self.tiles[i, j, :rows, :cols])
+
+    def iter_tiles(self):
+        """
+        Iterates over the tiles of the map, row by row.
+
+        Yields:
+            tuple: The (row, column) coordinates of the top-left cell of the \
+            tile and its cells.
+        """
+        for i in range(self.n_tiles):
+            for j in range(self.n_tiles):
+                yield (i * self.tile_size, j * self.tile_size), self.tile(i, j)
+
+    def read(self, rows: slice, cols: slice):
+        """
+        Reads a rectangular window of the map, touching only the tiles that \
+        overlap it.
+
+        Parameters:
+            rows (slice): The rows of the window.
+            cols (slice): The columns of the window.
+
+        Returns:
+            np.ndarray: The cells of the window.
+        """
+        row_start, row_stop, _ = rows.indices(self.map_size)
+        col_start, col_stop, _ = cols.indices(self.map_size)
+        window = np.empty(
+            (max(row_stop - row_start, 0), max(col_stop - col_start, 0)),
+            dtype=MAP_DTYPE,
+        )
+        t = self.tile_size
+        for i in range(row_start // t, -(-row_stop // t)):
+            for j in range(col_start // t, -(-col_stop // t)):
+                r0, r1 = max(row_start, i * t), min(row_stop, (i + 1) * t)
+                c0, c1 = max(col_start, j * t), min(col_stop, (j + 1) * t)
+                window[
+                    r0 - row_start : r1 - row_start, c0 - col_start : c1 - col_start
+                ] = self.tiles[i, j, r0 - i * t : r1 - i * t, c0 - j * t : c1 - j * t]
+        return window
+
+    def to_array(self):
+        """
+        Assembles the whole map in memory.
+
+        Returns:
+            np.ndarray: The map.
+        """
+        return self.read(slice(None), slice(None))
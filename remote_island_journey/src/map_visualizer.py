@@ -1,25 +1,37 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgb
 from src.environment import Environment
 from src.map_config import BLOCK_COLOR, BLOCK_ID
+from src.solvers import get_path
 
 
 class Map:
     """
     The Map class represents the island map and provides methods for visualizing the map, \
     actions, value functions, and paths.
+
+    In raster mode, the map is drawn as a single image and actions as a single field \
+    of arrows, which keeps rendering time and memory low on large maps. Every \
+    visualization can also be saved to a file instead of shown, e.g., in batch jobs \
+    without a display.
     """
 
     EDGE_COLOR = "#000000"
     ARROW_COLOR = "#000000"
     PATH_COLOR = "#292929"
 
-    def __init__(self, env: Environment):
+    def __init__(self, env: Environment, raster: bool = False):
         self._map_env = env
+        self._raster = raster
 
-    def visualize_map(self):
+    def visualize_map(self, file_path: str = None):
         """
         Visualizes the map with blocks.
+
+        Parameters:
+            file_path (str): If given, the plot is saved to this file (e.g., a .png) \
+                instead of shown.
         """
         fig, ax = plt.subplots()
 
@@ -29,14 +41,16 @@ class Map:
         ax.set_aspect("equal", adjustable="box")
         ax.axis("off")
 
-        plt.show()
+        self._show_or_save(fig, file_path)
 
-    def visualize_actions(self, actions: np.ndarray):
+    def visualize_actions(self, actions: np.ndarray, file_path: str = None):
         """
         Visualizes the map with actions represented by arrows.
 
         Parameters:
             actions (np.ndarray): An array of actions taken by the agent at each state.
+            file_path (str): If given, the plot is saved to this file (e.g., a .png) \
+                instead of shown.
         """
         # Create a plot and add map blocks
         fig, ax = plt.subplots()
@@ -44,22 +58,10 @@ class Map:
 
         # Plot actions
         n = self._map_env.map_size
-        for state in self._map_env.S:
-            if state in self._map_env.S_terminal:
-                continue
-            state_coords = self._map_env.S_coords[state]
-            x, y = state_coords[1], n - 1 - state_coords[0]
-            # Draw policy action
-            action = actions[state]
-            arrow = self._action_to_arrow(action)
-            ax.text(
-                x + 0.5,
-                y + 0.5,
-                arrow,
-                ha="center",
-                va="center",
-                color=__class__.ARROW_COLOR,
-            )
+        if self._raster:
+            self._add_action_arrows_to_axis(ax, np.asarray(actions))
+        else:
+            self._add_action_texts_to_axis(ax, actions)
 
         # Set plot limits and aspect
         ax.set_xlim(0, n)
@@ -68,24 +70,23 @@ class Map:
         ax.axis("off")
 
         # Show the plot
-        plt.show()
+        self._show_or_save(fig, file_path)
 
-    def visualize_value_function(self, V: np.ndarray):
+    def visualize_value_function(self, V: np.ndarray, file_path: str = None):
         """
         Visualizes the given value function using a color map.
 
         Parameters:
             V (np.ndarray): The value function to be visualized.
+            file_path (str): If given, the plot is saved to this file (e.g., a .png) \
+                instead of shown.
         """
         # Create a plot
         fig, ax = plt.subplots()
 
         # Draw the map
         n = self._map_env.map_size
-        value_matrix = np.zeros((n, n))
-        for state in self._map_env.S:
-            state_coords = self._map_env.S_coords[state]
-            value_matrix[n - state_coords[0] - 1, state_coords[1]] = V[state]
+        value_matrix = np.flipud(self._state_values_to_matrix(np.asarray(V)))
 
         cax = ax.matshow(value_matrix, cmap="viridis")
 
@@ -97,51 +98,42 @@ class Map:
         ax.set_xlim(-0.5, n - 0.5)
         ax.set_ylim(-0.5, n - 0.5)
         ax.set_aspect("equal", adjustable="box")
-        ax.set_xticks(np.arange(-0.5, n, 1), minor=True)
-        ax.set_yticks(np.arange(-0.5, n, 1), minor=True)
-        ax.grid(which="minor", color="w", linestyle="-", linewidth=1)
+        if not self._raster:
+            ax.set_xticks(np.arange(-0.5, n, 1), minor=True)
+            ax.set_yticks(np.arange(-0.5, n, 1), minor=True)
+            ax.grid(which="minor", color="w", linestyle="-", linewidth=1)
         ax.tick_params(
             which="both", bottom=False, left=False, labelbottom=False, labelleft=False
         )
 
         # Show the plot
-        plt.show()
+        self._show_or_save(fig, file_path)
 
-    def visualize_path(self, actions):
+    def visualize_path(
+        self, actions: np.ndarray = None, path: list = None, file_path: str = None
+    ):
         """
         Visualizes the path taken by the agent according to the provided actions.
 
         Parameters:
             actions (np.ndarray): An array of actions taken by the agent at each state.
+            path (list): The states visited by the agent, e.g., as returned by \
+                solvers.astar_path. When given, actions are ignored.
+            file_path (str): If given, the plot is saved to this file (e.g., a .png) \
+                instead of shown.
         """
         # Create a plot and add map blocks
         fig, ax = plt.subplots()
         self._add_map_blocks_to_axis(ax)
 
         # Find path followed guided by policy
-        current_state = self._map_env.initial_s
-        path = [current_state]
-        while True:
-            next_state, _ = self._map_env.step(current_state, actions[current_state])
-            path.append(next_state)
-            if next_state in path[:-1]:
-                # Loop in path
-                break
-            if next_state in self._map_env.S_terminal:
-                # Reached terminal state
-                break
-            current_state = next_state
+        if path is None:
+            path = get_path(actions, self._map_env)
 
         # Plot the path
         n = self._map_env.map_size
-        path_coords = [
-            (
-                self._map_env.S_coords[state][1] + 0.5,
-                n - self._map_env.S_coords[state][0] - 0.5,
-            )
-            for state in path
-        ]
-        path_x, path_y = zip(*path_coords)
+        rows, cols = self._map_env.get_coords_from_state(np.asarray(path))
+        path_x, path_y = cols + 0.5, n - rows - 0.5
         ax.plot(
             path_x,
             path_y,
@@ -158,18 +150,24 @@ class Map:
         ax.axis("off")
 
         # Show the plot
-        plt.show()
+        self._show_or_save(fig, file_path)
 
     def _add_map_blocks_to_axis(self, ax):
         # Draw the map
         n = self._map_env.map_size
+        if self._raster:
+            ax.imshow(
+                self._map_to_rgb(),
+                extent=(0, n, 0, n),
+                interpolation="nearest",
+            )
+            return
+
+        block_names = {value: key for key, value in BLOCK_ID.items()}
         for i in range(n):
             for j in range(n):
                 block_id = self._map_env.map[i, j]
-                block_name = [
-                    key for key, value in BLOCK_ID.items() if value == block_id
-                ][0]
-                color = BLOCK_COLOR[block_name]
+                color = BLOCK_COLOR[block_names[block_id]]
                 rect = plt.Rectangle(
                     (j, n - 1 - i),
                     1,
@@ -180,6 +178,76 @@ class Map:
                 )
                 ax.add_patch(rect)
 
+    def _add_action_texts_to_axis(self, ax, actions):
+        # Draw one arrow symbol per state
+        n = self._map_env.map_size
+        for state in self._map_env.S:
+            if state in self._map_env.S_terminal:
+                continue
+            state_coords = self._map_env.S_coords[state]
+            x, y = state_coords[1], n - 1 - state_coords[0]
+            # Draw policy action
+            action = actions[state]
+            arrow = self._action_to_arrow(action)
+            ax.text(
+                x + 0.5,
+                y + 0.5,
+                arrow,
+                ha="center",
+                va="center",
+                color=__class__.ARROW_COLOR,
+            )
+
+    def _add_action_arrows_to_axis(self, ax, actions):
+        # Draw all arrows with a single quiver call
+        n = self._map_env.map_size
+        directions = np.zeros((len(Environment.ACTIONS), 2))
+        for name, action in Environment.ACTIONS.items():
+            di, dj = Environment.ACTION_OFFSETS[name]
+            directions[action] = (dj, -di)
+
+        states = np.setdiff1d(self._map_env.S, self._map_env.S_terminal)
+        rows, cols = self._map_env.get_coords_from_state(states)
+        u, v = directions[actions[states]].T
+        ax.quiver(
+            cols + 0.5,
+            n - rows - 0.5,
+            u,
+            v,
+            color=__class__.ARROW_COLOR,
+            pivot="middle",
+            angles="xy",
+            scale_units="xy",
+            scale=1.5,
+        )
+
+    def _map_to_rgb(self):
+        """
+        Converts the map into an RGB image with a color lookup table.
+        """
+        colors = np.zeros((max(BLOCK_ID.values()) + 1, 3))
+        for name, block_id in BLOCK_ID.items():
+            colors[block_id] = to_rgb(BLOCK_COLOR[name])
+        return colors[np.asarray(self._map_env.map)]
+
+    def _state_values_to_matrix(self, values):
+        """
+        Arranges per-state values into a matrix with the layout of the map.
+        """
+        n = self._map_env.map_size
+        # States enumerate the map column by column
+        return values.reshape(n, n).T
+
+    def _show_or_save(self, fig, file_path):
+        """
+        Shows the figure, or saves it to file_path and closes it if given.
+        """
+        if file_path is None:
+            plt.show()
+        else:
+            fig.savefig(file_path, bbox_inches="tight")
+            plt.close(fig)
+
     def _action_to_arrow(self, action):
         """
         Converts an action to an arrow symbol for plotting.
@@ -0,0 +1,821 @@
+import heapq
+import warnings
+import numpy as np
+from collections import defaultdict
+from src.environment import Environment
+from src.map_config import BLOCK_ID
+
+
+def q_values(
+    V: np.ndarray, env: Environment, gamma: float = 1.0, out: np.ndarray = None
+):
+    """
+    Computes the action values of every (state, action) pair at once.
+
+    Parameters:
+        V (np.ndarray): The value function.
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        out (np.ndarray): An optional (|A|, |S|) buffer to write the action \
+            values into, so repeated calls do not allocate.
+
+    Returns:
+        np.ndarray: A (|S|, |A|) array with the action values.
+    """
+    if out is None:
+        out = np.empty((len(env.A), len(env.S)))
+    np.take(V, env.next_state.T, out=out, mode="clip")
+    out *= gamma
+    out += env.reward.T
+    return out.T
+
+
+def get_policy(V: np.ndarray, env: Environment, gamma: float = 1.0):
+    """
+    Extracts the greedy policy with respect to a value function.
+
+    Parameters:
+        V (np.ndarray): The value function.
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+
+    Returns:
+        np.ndarray: The greedy action of each state.
+    """
+    return np.argmax(q_values(V, env, gamma), axis=1)
+
+
+def get_path(actions: np.ndarray, env: Environment, start: int = None):
+    """
+    Follows a policy from a state until a terminal state is reached or a \
+    state is visited twice.
+
+    Parameters:
+        actions (np.ndarray): The action of each state.
+        env (Environment): The environment.
+        start (int): The first state of the path. Defaults to the initial \
+            state of the environment.
+
+    Returns:
+        list: The states visited along the path.
+    """
+    current_state = env.initial_s if start is None else start
+    path = [current_state]
+    visited = {current_state}
+    is_terminal = np.zeros(len(env.S), dtype=bool)
+    is_terminal[env.S_terminal] = True
+    while not is_terminal[current_state]:
+        current_state = env.next_state[current_state, actions[current_state]]
+        path.append(current_state)
+        if current_state in visited:
+            # Loop in path
+            break
+        visited.add(current_state)
+    return path
+
+
+def policy_evaluation(
+    policy: np.ndarray,
+    env: Environment,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_iter: int = 10_000,
+    V: np.ndarray = None,
+):
+    """
+    Computes the value function of a policy with iterative policy evaluation. \
+    Every iteration updates all states at once.
+
+    Parameters:
+        policy (np.ndarray): Either the action of each state, or a \
+            (|A|, |S|) matrix with the probability of taking each action in \
+            each state.
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        tol (float): The evaluation stops when max_s |V_k(s) - V_k+1(s)| is \
+            below this threshold.
+        max_iter (int): The maximum number of iterations.
+        V (np.ndarray): The initial value function. Defaults to zeros.
+
+    Returns:
+        tuple: The value function and an array with max_s |V_k(s) - V_k+1(s)| \
+        for each iteration.
+    """
+    policy = np.asarray(policy)
+    V = np.zeros(len(env.S)) if V is None else np.array(V, dtype=float)
+    if policy.ndim == 1:
+        next_state = env.next_state[env.S, policy]
+        reward = env.reward[env.S, policy]
+    else:
+        pi = policy.T
+        Q = np.empty((len(env.A), len(env.S)))
+
+    deltas = []
+    for _ in range(max_iter):
+        if policy.ndim == 1:
+            new_V = reward + gamma * V[next_state]
+        else:
+            new_V = np.sum(pi * q_values(V, env, gamma, out=Q), axis=1)
+        deltas.append(np.max(np.abs(new_V - V)))
+        V = new_V
+        if deltas[-1] < tol:
+            break
+    return V, np.array(deltas)
+
+
+def sparse_policy_evaluation(
+    policy: np.ndarray,
+    env: Environment,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_iter: int = 10_000,
+    exact: bool = False,
+):
+    """
+    Computes the value function of a policy from the sparse transition \
+    matrix of the environment (see Environment.transition_matrix). The \
+    value function is either approximated with sparse matrix-vector \
+    products or computed exactly with a sparse linear solve of \
+    (I - gamma * P_pi) V = R_pi. Terminal states end the episode and have \
+    value 0. Requires scipy.
+
+    Parameters:
+        policy (np.ndarray): Either the action of each state, or a \
+            (|A|, |S|) matrix with the probability of taking each action in \
+            each state.
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        tol (float): The evaluation stops when max_s |V_k(s) - V_k+1(s)| is \
+            below this threshold. Ignored when exact is True.
+        max_iter (int): The maximum number of iterations. Ignored when \
+            exact is True.
+        exact (bool): Whether to solve the linear system instead of \
+            iterating. With gamma = 1 the policy must reach a terminal state \
+            from every state, otherwise the system is singular.
+
+    Returns:
+        tuple: The value function and an array with max_s |V_k(s) - V_k+1(s)| \
+        for each iteration (empty when exact is True).
+    """
+    from scipy.sparse import csr_matrix, diags, identity
+    from scipy.sparse.linalg import spsolve
+
+    P, R = env.transition_matrix()
+
+    # Pi maps each state to the (state, action) rows of P it follows
+    n_states, n_actions = len(env.S), len(env.A)
+    policy = np.asarray(policy)
+    if policy.ndim == 1:
+        policy = np.eye(n_actions)[:, policy]
+    rows = np.repeat(env.S, n_actions)
+    cols = np.arange(n_states * n_actions)
+    Pi = csr_matrix(
+        (policy.T.ravel(), (rows, cols)), shape=(n_states, n_states * n_actions)
+    )
+    P_pi = Pi @ P
+    R_pi = Pi @ R
+
+    if exact:
+        # Fix terminal values to 0 so the system is not singular
+        not_terminal = np.ones(n_states)
+        not_terminal[env.S_terminal] = 0
+        system = identity(n_states) - gamma * (diags(not_terminal) @ P_pi)
+        V = spsolve(system.tocsc(), not_terminal * R_pi)
+        return V, np.array([])
+
+    V = np.zeros(n_states)
+    deltas = []
+    for _ in range(max_iter):
+        new_V = R_pi + gamma * (P_pi @ V)
+        deltas.append(np.max(np.abs(new_V - V)))
+        V = new_V
+        if deltas[-1] < tol:
+            break
+    return V, np.array(deltas)
+
+
+def value_iteration(
+    env: Environment,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_iter: int = 10_000,
+    V: np.ndarray = None,
+):
+    """
+    Approximates the optimal value function with value iteration. Every \
+    iteration applies the Bellman optimality update to all states at once.
+
+    Parameters:
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        tol (float): The iteration stops when max_s |V_k(s) - V_k+1(s)| is \
+            below this threshold.
+        max_iter (int): The maximum number of iterations.
+        V (np.ndarray): The initial value function. Defaults to zeros.
+
+    Returns:
+        tuple: The value function, the greedy action of each state and an \
+        array with max_s |V_k(s) - V_k+1(s)| for each iteration.
+    """
+    V = np.zeros(len(env.S)) if V is None else np.array(V, dtype=float)
+    Q = np.empty((len(env.A), len(env.S)))
+    deltas = []
+    for _ in range(max_iter):
+        new_V = np.max(q_values(V, env, gamma, out=Q), axis=1)
+        deltas.append(np.max(np.abs(new_V - V)))
+        V = new_V
+        if deltas[-1] < tol:
+            break
+    return V, get_policy(V, env, gamma), np.array(deltas)
+
+
+def policy_iteration(
+    env: Environment,
+    gamma: float = 1.0,
+    max_iter: int = 1_000,
+    actions: np.ndarray = None,
+    tol: float = 1e-10,
+):
+    """
+    Finds an optimal policy with policy iteration. Since transitions are \
+    deterministic, policies are evaluated without iterating over the \
+    state space until convergence: the returns are accumulated along the \
+    trajectories of all states at once by repeatedly doubling the number \
+    of steps taken. With gamma = 1 each evaluation is exact and needs \
+    log2(|S|) whole-state-space updates, and states whose trajectory never \
+    reaches a terminal state get a value of -inf. With gamma < 1 the \
+    doubling stops once the discounted return left is below tol.
+
+    By default, the first policy follows the shortest paths to the \
+    terminal states (see shortest_path_values), which is already optimal \
+    with gamma = 1. Starting from a policy that does not reach the \
+    terminal states, each improvement step only fixes the states next to \
+    the ones that do, so the number of steps grows with the map size. A \
+    RuntimeWarning is raised if the policy is still changing after \
+    max_iter steps.
+
+    Parameters:
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        max_iter (int): The maximum number of policy improvement steps.
+        actions (np.ndarray): The initial action of each state. Defaults to \
+            the shortest-path policy.
+        tol (float): The maximum error of each policy evaluation with \
+            gamma < 1, below which action values are considered equal.
+
+    Returns:
+        tuple: The value function, the action of each state and an array \
+        with the number of states whose action changed on each improvement \
+        step.
+    """
+    if actions is None:
+        _, actions, _ = shortest_path_values(env)
+    actions = np.array(actions)
+
+    changes = []
+    for _ in range(max_iter):
+        V = _evaluate_actions(actions, env, gamma, tol)
+
+        # Only switch actions that are better by more than the evaluation
+        # error, to avoid cycling between equally good policies
+        Q = q_values(V, env, gamma)
+        greedy = np.argmax(Q, axis=1)
+        improve = Q[env.S, greedy] > Q[env.S, actions] + (tol if gamma < 1 else 0)
+        actions[improve] = greedy[improve]
+        changes.append(np.count_nonzero(improve))
+
+        if changes[-1] == 0:
+            break
+    else:
+        warnings.warn(
+            f"Policy iteration did not converge in {max_iter} steps",
+            RuntimeWarning,
+        )
+    return V, actions, np.array(changes)
+
+
+def _evaluate_actions(
+    actions: np.ndarray, env: Environment, gamma: float, tol: float = 1e-10
+):
+    """
+    Evaluates a deterministic policy by pointer doubling. After k rounds, \
+    returns[s] holds the discounted reward collected during the first 2^k \
+    steps from s and state[s] the state reached after them.
+
+    Parameters:
+        actions (np.ndarray): The action of each state.
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        tol (float): With gamma < 1, the doubling stops once the discounted \
+            return after the first 2^k steps is below this threshold.
+
+    Returns:
+        np.ndarray: The value function of the policy, with -inf for the \
+        states whose trajectory never reaches a terminal state when \
+        gamma = 1.
+    """
+    state = env.next_state[env.S, actions]
+    returns = env.reward[env.S, actions]
+    discount = gamma
+
+    if gamma == 1:
+        # After |S| steps, trajectories have either reached a terminal
+        # state or are stuck in a loop
+        for _ in range(int(np.ceil(np.log2(max(len(env.S), 2))))):
+            returns = returns + returns[state]
+            state = state[state]
+        is_terminal = np.zeros(len(env.S), dtype=bool)
+        is_terminal[env.S_terminal] = True
+        returns[~is_terminal[state]] = -np.inf
+        return returns
+
+    # The return after 2^k steps is bounded by gamma^(2^k) * max|r| / (1 - gamma)
+    max_return = np.max(np.abs(env.reward), initial=0) / (1 - gamma)
+    while discount * max_return >= tol:
+        returns = returns + discount * returns[state]
+        state = state[state]
+        discount *= discount
+    return returns
+
+
+def prioritized_sweeping(
+    env: Environment,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_backups: int = None,
+    V: np.ndarray = None,
+):
+    """
+    Approximates the optimal value function with prioritized sweeping. \
+    States are backed up one at a time in order of decreasing Bellman \
+    error. After each backup, the Bellman errors of the predecessors of the \
+    updated state are recomputed and queued, so the updates concentrate on \
+    the region where the values are still changing.
+
+    By default, values start from a pessimistic bound, with terminal states \
+    at 0. Backups then only raise values, and states are first updated in \
+    order of decreasing value, outward from the terminal states, which \
+    avoids most repeated backups.
+
+    With gamma = 1, the values of states that cannot reach a terminal \
+    state would decrease forever, so they are set to -inf and never \
+    backed up.
+
+    Parameters:
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        tol (float): States whose Bellman error is below this threshold are \
+            not queued.
+        max_backups (int): The maximum number of backups. Defaults to no \
+            limit.
+        V (np.ndarray): The initial value function. Defaults to the \
+            pessimistic bound.
+
+    Returns:
+        tuple: The value function, the greedy action of each state and the \
+        number of backups performed.
+    """
+    V = _pessimistic_values(env, gamma) if V is None else np.array(V, dtype=float)
+    if gamma == 1:
+        _, reachable = _layers_from_terminal_states(env)
+        V[~reachable] = -np.inf
+    indptr, pred = env.predecessor_index()
+
+    # Python lists make the per-state updates much cheaper than numpy scalars
+    next_state = env.next_state.tolist()
+    reward = env.reward.tolist()
+    values = V.tolist()
+    indptr, pred = indptr.tolist(), pred.tolist()
+
+    def backup(s):
+        return max(r + gamma * values[sp] for sp, r in zip(next_state[s], reward[s]))
+
+    self_loop = np.any(env.next_state == env.S[:, np.newaxis], axis=1).tolist()
+
+    # Initial priorities are the Bellman errors of all states. The errors
+    # of states at -inf are nan, so they are not queued, and their
+    # predecessors cannot reach a terminal state either
+    with np.errstate(invalid="ignore"):
+        errors = np.abs(np.max(q_values(V, env, gamma), axis=1) - V)
+    errors[np.isnan(errors)] = 0
+    priority = errors.tolist()
+    queue = [(-priority[s], s) for s in np.flatnonzero(errors > tol).tolist()]
+
+    n_backups, _ = _prioritized_sweep(
+        values,
+        backup,
+        lambda s: pred[indptr[s] : indptr[s + 1]],
+        self_loop.__getitem__,
+        queue,
+        priority,
+        tol,
+        max_backups,
+    )
+
+    V = np.array(values)
+    return V, get_policy(V, env, gamma), n_backups
+
+
+def incremental_value_iteration(
+    env: Environment,
+    V: np.ndarray,
+    states: np.ndarray,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_backups: int = None,
+    actions: np.ndarray = None,
+):
+    """
+    Re-solves the environment after some of its transitions changed (see \
+    Environment.update_cells), warm-starting from the previous value \
+    function. Only the region affected by the change is visited:
+
+    1. States whose value can no longer be achieved, and the states whose \
+       values were derived from them, are reset to the pessimistic bound.
+    2. Prioritized sweeping re-propagates values from the changed states \
+       and the reset states outward.
+
+    With gamma = 1, states that cannot reach a terminal state after the \
+    change are set to -inf and never backed up, as in prioritized_sweeping. \
+    Finding them takes one breadth-first search over the whole map.
+
+    Parameters:
+        env (Environment): The updated environment.
+        V (np.ndarray): The value function before the change.
+        states (np.ndarray): The states whose transitions changed, as \
+            returned by Environment.update_cells.
+        gamma (float): The discount factor.
+        tol (float): States whose Bellman error is below this threshold are \
+            not queued.
+        max_backups (int): The maximum number of backups. Defaults to no \
+            limit.
+        actions (np.ndarray): The greedy actions before the change. When \
+            given, only the actions of the affected region are recomputed, \
+            in place. Otherwise, the greedy policy is recomputed for all \
+            states.
+
+    Returns:
+        tuple: The value function, the greedy action of each state and the \
+        number of backups performed.
+    """
+    V = np.array(V, dtype=float)
+    states = np.unique(states).tolist()
+    terminal = set(env.S_terminal.tolist())
+
+    def transitions(s):
+        return zip(env.next_state[s].tolist(), env.reward[s].tolist())
+
+    def backup(s):
+        return max(r + gamma * V[sp] for sp, r in transitions(s))
+
+    # Reset states whose value relied on transitions that got worse,
+    # following the states whose value was derived through them
+    invalid = set()
+    stack = [s for s in states if s not in terminal and backup(s) < V[s] - tol]
+    while stack:
+        s = stack.pop()
+        if s in invalid:
+            continue
+        invalid.add(s)
+        for p in env.get_predecessors(s):
+            if p in invalid or p in terminal:
+                continue
+            if any(
+                sp == s and abs(r + gamma * V[s] - V[p]) <= tol
+                for sp, r in transitions(p)
+            ):
+                stack.append(p)
+
+    bound = _pessimistic_bound(env, gamma)
+    for s in invalid:
+        V[s] = bound
+    for s in states:
+        if s in terminal:
+            V[s] = 0
+    if gamma == 1:
+        _, reachable = _layers_from_terminal_states(env)
+        V[~reachable] = -np.inf
+
+    # Re-propagate from the changed and reset states
+    seeds = set(states) | invalid
+    for s in list(seeds):
+        seeds.update(env.get_predecessors(s))
+    priority = defaultdict(float)
+    queue = []
+    for s in seeds:
+        # States staying at -inf have a nan error and are not queued
+        with np.errstate(invalid="ignore"):
+            error = abs(backup(s) - V[s])
+        if error > tol:
+            priority[s] = error
+            queue.append((-error, s))
+
+    n_backups, updated = _prioritized_sweep(
+        V,
+        backup,
+        env.get_predecessors,
+        lambda s: s in env.next_state[s],
+        queue,
+        priority,
+        tol,
+        max_backups,
+    )
+
+    if actions is None:
+        return V, get_policy(V, env, gamma), n_backups
+
+    # Greedy actions change where transitions or successor values changed
+    region = seeds | updated
+    for s in updated:
+        region.update(env.get_predecessors(s))
+    region = np.fromiter(region, dtype=int)
+    actions[region] = np.argmax(
+        env.reward[region] + gamma * V[env.next_state[region]], axis=1
+    )
+    return V, actions, n_backups
+
+
+def gauss_seidel_value_iteration(
+    env: Environment,
+    gamma: float = 1.0,
+    tol: float = 1e-5,
+    max_iter: int = 10_000,
+    V: np.ndarray = None,
+):
+    """
+    Approximates the optimal value function with Gauss-Seidel value \
+    iteration. Each sweep visits the states outward from the terminal \
+    states, layer by layer in breadth-first order over the predecessor \
+    index, and every layer is updated using the values already computed \
+    for the layers closer to the terminal states. Like prioritized_sweeping, \
+    values start by default from a pessimistic bound, so that a single \
+    outward sweep already carries the values of the terminal states across \
+    the whole map.
+
+    Parameters:
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+        tol (float): The iteration stops when max_s |V_k(s) - V_k+1(s)| is \
+            below this threshold.
+        max_iter (int): The maximum number of sweeps.
+        V (np.ndarray): The initial value function. Defaults to the \
+            pessimistic bound.
+
+    Returns:
+        tuple: The value function, the greedy action of each state and the \
+        number of backups performed.
+    """
+    V = _pessimistic_values(env, gamma) if V is None else np.array(V, dtype=float)
+    layers, _ = _layers_from_terminal_states(env)
+
+    n_backups = 0
+    for _ in range(max_iter):
+        delta = 0.0
+        for layer in layers:
+            new_V = np.max(env.reward[layer] + gamma * V[env.next_state[layer]], axis=1)
+            delta = max(delta, np.max(np.abs(new_V - V[layer])))
+            V[layer] = new_V
+            n_backups += len(layer)
+        if delta < tol:
+            break
+    return V, get_policy(V, env, gamma), n_backups
+
+
+def shortest_path_values(env: Environment):
+    """
+    Computes the optimal undiscounted value function with a multi-source \
+    Dijkstra search from all terminal states. Since transitions are \
+    deterministic and rewards are non-positive, -V(s) is the length of the \
+    shortest path from s to a terminal state, where moving into a block \
+    costs minus its reward. The result is the value function value \
+    iteration converges to with gamma = 1, in O(|S| log |S|).
+
+    Parameters:
+        env (Environment): The environment.
+
+    Returns:
+        tuple: The value function (-inf for states that cannot reach a \
+        terminal state), the greedy action of each state and the number of \
+        states settled by the search.
+    """
+    indptr, pred = env.predecessor_index()
+    next_state = env.next_state.tolist()
+    reward = env.reward.tolist()
+    indptr, pred = indptr.tolist(), pred.tolist()
+
+    distance = [np.inf] * len(env.S)
+    queue = []
+    for s in env.S_terminal.tolist():
+        distance[s] = 0.0
+        queue.append((0.0, s))
+    heapq.heapify(queue)
+
+    settled = [False] * len(env.S)
+    n_settled = 0
+    while queue:
+        d, s = heapq.heappop(queue)
+        if settled[s]:
+            continue
+        settled[s] = True
+        n_settled += 1
+
+        for p in pred[indptr[s] : indptr[s + 1]]:
+            cost = min(-r for sp, r in zip(next_state[p], reward[p]) if sp == s)
+            if d + cost < distance[p]:
+                distance[p] = d + cost
+                heapq.heappush(queue, (d + cost, p))
+
+    V = -np.array(distance)
+    return V, get_policy(V, env), n_settled
+
+
+def astar_path(env: Environment, start: int = None):
+    """
+    Finds the shortest path from a state to the closest terminal state \
+    with A*. The heuristic is the Manhattan distance to the closest \
+    terminal state scaled by the cheapest block cost, which never \
+    overestimates the remaining cost.
+
+    Parameters:
+        env (Environment): The environment.
+        start (int): The first state of the path. Defaults to the initial \
+            state of the environment.
+
+    Returns:
+        tuple: The states visited along the path (empty if no terminal \
+        state can be reached), the value of the start state and the number \
+        of states expanded by the search.
+    """
+    start = env.initial_s if start is None else start
+    next_state = env.next_state.tolist()
+    reward = env.reward.tolist()
+    is_terminal = np.zeros(len(env.S), dtype=bool)
+    is_terminal[env.S_terminal] = True
+
+    # Every step costs at least the cheapest block, except the last one,
+    # which enters a terminal state
+    min_cost = min(
+        -value
+        for block, value in env.block_penalization.items()
+        if block != BLOCK_ID["end"]
+    )
+    end_cost = -env.block_penalization[BLOCK_ID["end"]]
+    terminal_coords = np.stack(env.get_coords_from_state(env.S_terminal), axis=1)
+
+    def heuristic(s):
+        if is_terminal[s] or len(terminal_coords) == 0:
+            return 0.0
+        steps = np.min(
+            np.sum(np.abs(terminal_coords - env.get_coords_from_state(s)), axis=1)
+        )
+        return (steps - 1) * min_cost + end_cost
+
+    distance = {start: 0.0}
+    came_from = {start: None}
+    queue = [(heuristic(start), start)]
+    closed = set()
+    while queue:
+        _, s = heapq.heappop(queue)
+        if s in closed:
+            continue
+        if is_terminal[s]:
+            path = [s]
+            while came_from[path[-1]] is not None:
+                path.append(came_from[path[-1]])
+            return path[::-1], -distance[s], len(closed)
+        closed.add(s)
+
+        for sp, r in zip(next_state[s], reward[s]):
+            d = distance[s] - r
+            if sp not in closed and d < distance.get(sp, np.inf):
+                distance[sp] = d
+                came_from[sp] = s
+                heapq.heappush(queue, (d + heuristic(sp), sp))
+
+    return [], -np.inf, len(closed)
+
+
+def _prioritized_sweep(
+    values,
+    backup,
+    predecessors,
+    has_self_loop,
+    queue,
+    priority,
+    tol: float,
+    max_backups: int,
+):
+    """
+    Runs the prioritized sweeping loop until no state has a Bellman error \
+    above tol.
+
+    Parameters:
+        values: The value of each state, updated in place.
+        backup (callable): Computes the Bellman optimality update of a state.
+        predecessors (callable): Returns the predecessors of a state, \
+            without the state itself.
+        has_self_loop (callable): Whether some action leaves a state on \
+            itself.
+        queue (list): The initial (-priority, state) entries.
+        priority: The queued priority of each state, updated in place.
+        tol (float): States whose Bellman error is below this threshold are \
+            not queued.
+        max_backups (int): The maximum number of backups, or None.
+
+    Returns:
+        tuple: The number of backups performed and the set of states backed \
+        up.
+    """
+    heapq.heapify(queue)
+    n_backups = 0
+    updated = set()
+    while queue and (max_backups is None or n_backups < max_backups):
+        error, s = heapq.heappop(queue)
+        if -error != priority[s]:
+            # Stale entry, the state was queued again with another priority
+            continue
+        priority[s] = 0.0
+        values[s] = backup(s)
+        n_backups += 1
+        updated.add(s)
+
+        # With gamma < 1, a state that stays put needs more than one backup
+        # to settle, and it is not among its own predecessors
+        if has_self_loop(s):
+            error = abs(backup(s) - values[s])
+            if error > tol:
+                priority[s] = error
+                heapq.heappush(queue, (-error, s))
+
+        for p in predecessors(s):
+            error = abs(backup(p) - values[p])
+            if error > tol and error > priority[p]:
+                priority[p] = error
+                heapq.heappush(queue, (-error, p))
+    return n_backups, updated
+
+
+def _pessimistic_bound(env: Environment, gamma: float):
+    """
+    Computes a lower bound of the return of any policy reaching a terminal \
+    state.
+
+    Parameters:
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+
+    Returns:
+        float: The pessimistic bound.
+    """
+    horizon = len(env.S) if gamma == 1 else 1 / (1 - gamma)
+    return float(min(min(env.block_penalization.values()), 0) * horizon)
+
+
+def _pessimistic_values(env: Environment, gamma: float):
+    """
+    Builds a value function that lower bounds the return of any policy \
+    reaching a terminal state, with terminal states at 0.
+
+    Parameters:
+        env (Environment): The environment.
+        gamma (float): The discount factor.
+
+    Returns:
+        np.ndarray: The pessimistic value function.
+    """
+    V = np.full(len(env.S), _pessimistic_bound(env, gamma))
+    V[env.S_terminal] = 0
+    return V
+
+
+def _layers_from_terminal_states(env: Environment):
+    """
+    Splits the states into breadth-first layers over the predecessor index, \
+    starting from the terminal states. States that cannot reach a terminal \
+    state are placed in a last layer.
+
+    Parameters:
+        env (Environment): The environment.
+
+    Returns:
+        tuple: The list of arrays of states of each layer and a boolean \
+        array marking the states that can reach a terminal state.
+    """
+    indptr, pred = env.predecessor_index()
+    visited = np.zeros(len(env.S), dtype=bool)
+    frontier = np.unique(env.S_terminal).astype(int)
+    visited[frontier] = True
+
+    layers = []
+    while len(frontier) > 0:
+        layers.append(frontier)
+        # Gather the predecessors of all frontier states at once
+        starts, counts = indptr[frontier], np.diff(indptr)[frontier]
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        candidates = pred[offsets + np.arange(np.sum(counts))]
+        frontier = np.unique(candidates[~visited[candidates]])
+        visited[frontier] = True
+
+    if not np.all(visited):
+        layers.append(np.flatnonzero(~visited))
+    return layers, visited